@@ -17,29 +17,532 @@
 #    License along with this library; if not, write to the Free Software
 #    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
 #
+import bisect
+import collections
+import concurrent.futures
 import contextlib
+import errno
+import hashlib
 import io
+import json
 import os
 import pathlib
-from mmap import mmap
-from typing import Any, Container, List, Optional, Union
+import re
+import struct
+import threading
+import time
+import zlib
+from mmap import ACCESS_READ, mmap
+from typing import (
+    Any,
+    Callable,
+    Container,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
+from .aio import AsyncMultiVolume, aopen
 from .stat import stat_result
 
-__all__ = ["stat_result", "open", "MultiVolume"]
+try:
+    import bz2
+except ImportError:  # pragma: no cover
+    bz2 = None  # type: ignore
+try:
+    import lzma
+except ImportError:  # pragma: no cover
+    lzma = None  # type: ignore
+
+__all__ = [
+    "stat_result",
+    "open",
+    "MultiVolume",
+    "CompressedMultiVolume",
+    "AsyncMultiVolume",
+    "aopen",
+]
 
 BLOCKSIZE = 16384
+COPY_BUFSIZE = 1024 * 1024
+IOV_MAX = 1024
+CACHE_DROP_SIZE = 8 * 1024 * 1024
+CACHE_POLICIES = [None, "stream"]
+MANIFEST_SUFFIX = ".manifest"
+JOURNAL_SUFFIX = ".journal"
+CACHE_BLOCKSIZE = 64 * 1024
+CODEC_BLOCKSIZE = 64 * 1024
+CODEC_CACHE_BLOCKS = 8
+# codec name -> (id stored in volume footer, module)
+CODECS = {
+    name: (num, module)
+    for num, name, module in [(1, "zlib", zlib), (2, "bz2", bz2), (3, "lzma", lzma)]
+    if module is not None
+}
+
+_ZERO_BLOCK = bytes(BLOCKSIZE)
+_DECIMAL_EXT = re.compile("[0-9]+")
+_HEX_EXT = re.compile("[0-9a-f]+")
+
+# volume footer: magic, codec id, block size, uncompressed size, number of blocks
+_BLOCK_FOOTER = struct.Struct("<4sBxxxIQQ")
+_BLOCK_MAGIC = b"MVZ\x01"
 
+# errors that mean the kernel refuses an offloaded copy between the fds.
+_COPY_FALLBACK_ERRORS = frozenset(
+    [
+        errno.EBADF,
+        errno.EINVAL,
+        errno.ENOSYS,
+        errno.ENOTSOCK,
+        errno.ENOTSUP,
+        errno.EOPNOTSUPP,
+        errno.EXDEV,
+    ]
+)
 
-def open(name: Union[pathlib.Path, str], mode=None, volume=None) -> io.RawIOBase:
+
+def open(
+    name: Union[pathlib.Path, str], mode=None, volume=None, codec=None
+) -> io.RawIOBase:
+    if codec is not None:
+        return CompressedMultiVolume(name, mode=mode, volume=volume, codec=codec)
     return MultiVolume(name, mode=mode, volume=volume)
 
 
 class _FileInfo:
-    def __init__(self, filename, stat, size):
+    def __init__(self, filename, stat, size, mtime_ns=None):
         self.filename = filename
         self.stat = stat
         self.size = size
+        self.mtime_ns = mtime_ns
+
+
+class _FilePool:
+    """
+    Keep at most `maxsize` volumes open, closing least recently used ones.
+    Volumes acquired by positional readers are pinned and never closed under them.
+    """
+
+    def __init__(self, opener, maxsize: int, closer=None):
+        if maxsize < 1:
+            raise ValueError("max_open_files should be positive.")
+        self._opener = opener
+        self._closer = closer if closer is not None else lambda file: file.close()
+        self._maxsize = maxsize
+        self._entries = collections.OrderedDict()  # type: collections.OrderedDict
+        self._pins = collections.Counter()  # type: collections.Counter
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, index: int):
+        file = self._entries.get(index)
+        if file is not None:
+            self._entries.move_to_end(index)
+            self.hits += 1
+            return file
+        self.misses += 1
+        file = self._opener(index)
+        self._put(index, file)
+        return file
+
+    def _put(self, index: int, file) -> None:
+        self._entries[index] = file
+        self._entries.move_to_end(index)
+        while len(self._entries) > self._maxsize:
+            if self._pins:
+                old = next(
+                    (i for i in self._entries if i != index and i not in self._pins),
+                    None,
+                )
+                if old is None:
+                    break
+                self._closer(self._entries.pop(old))
+            else:
+                self._closer(self._entries.popitem(last=False)[1])
+
+    def get(self, index: int):
+        with self._lock:
+            return self._get(index)
+
+    def put(self, index: int, file) -> None:
+        with self._lock:
+            self._put(index, file)
+
+    def acquire(self, index: int):
+        with self._lock:
+            file = self._get(index)
+            self._pins[index] += 1
+            return file
+
+    def release(self, index: int) -> None:
+        with self._lock:
+            self._pins[index] -= 1
+            if self._pins[index] <= 0:
+                del self._pins[index]
+
+    def peek(self, index: int):
+        """Return the volume when it is open, without opening nor touching LRU order."""
+        with self._lock:
+            return self._entries.get(index)
+
+    def discard(self, index: int) -> None:
+        with self._lock:
+            file = self._entries.pop(index, None)
+        if file is not None:
+            self._closer(file)
+
+    def files(self):
+        with self._lock:
+            return list(self._entries.values())
+
+    def close(self) -> None:
+        with self._lock:
+            while self._entries:
+                _, file = self._entries.popitem(last=False)
+                self._closer(file)
+
+
+class _BlockCache:
+    """Keep blocks of volumes up to `budget` bytes, evicting least recently used ones."""
+
+    def __init__(self, budget: int):
+        if budget < 1:
+            raise ValueError("block_cache should be positive.")
+        self._budget = budget
+        self._size = 0
+        self._entries = collections.OrderedDict()  # type: collections.OrderedDict
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key, data: bytes) -> None:
+        with self._lock:
+            if key in self._entries or len(data) > self._budget:
+                return
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self._budget:
+                _, old = self._entries.popitem(last=False)
+                self._size -= len(old)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+class _IOStats:
+    """Counters and timings of I/O calls, collected only when statistics are enabled."""
+
+    READ_METHODS = [
+        "read",
+        "readinto",
+        "readline",
+        "pread",
+        "preadinto",
+        "read_ranges",
+        "copy_to",
+    ]
+    WRITE_METHODS = ["write", "writelines", "write_parallel", "copy_from"]
+
+    def __init__(self, hook: Optional[Callable[[str, int, float], None]] = None):
+        self.calls = collections.Counter()  # type: collections.Counter
+        self.bytes = collections.Counter()  # type: collections.Counter
+        self.time = collections.Counter()  # type: collections.Counter
+        self.events = collections.Counter()  # type: collections.Counter
+        self._hook = hook
+        self._lock = threading.Lock()
+
+    def record(self, method: str, size: int, start: float) -> None:
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.calls[method] += 1
+            self.bytes[method] += size
+            self.time[method] += elapsed
+        if self._hook is not None:
+            self._hook(method, size, elapsed)
+
+    def count(self, event: str) -> None:
+        with self._lock:
+            self.events[event] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            result = {
+                "calls": dict(self.calls),
+                "bytes": dict(self.bytes),
+                "time": dict(self.time),
+                "bytes_read": sum(self.bytes[m] for m in self.READ_METHODS),
+                "bytes_written": sum(self.bytes[m] for m in self.WRITE_METHODS),
+                "io_time": sum(self.time.values()),
+            }  # type: Dict[str, Any]
+            for event in ["volume_switches", "seeks", "files_opened", "files_closed"]:
+                result[event] = self.events[event]
+        return result
+
+
+def _copy_file_range(src: int, dst: int, count: int, offset: Optional[int]) -> int:
+    if not hasattr(os, "copy_file_range"):
+        raise OSError(errno.ENOSYS, "copy_file_range is not available")
+    return os.copy_file_range(src, dst, count, offset)
+
+
+def _sendfile(src: int, dst: int, count: int, offset: Optional[int]) -> int:
+    if not hasattr(os, "sendfile"):
+        raise OSError(errno.ENOSYS, "sendfile is not available")
+    return os.sendfile(dst, src, offset, count)
+
+
+def _copy_buffered(src: int, dst: int, count: int, offset: Optional[int]) -> int:
+    size = min(count, COPY_BUFSIZE)
+    if offset is None:
+        data = os.read(src, size)
+    elif hasattr(os, "pread"):
+        data = os.pread(src, size, offset)
+    else:
+        os.lseek(src, offset, os.SEEK_SET)
+        data = os.read(src, size)
+    with memoryview(data) as view:
+        written = 0
+        while written < len(view):
+            written += os.write(dst, view[written:])
+    return len(data)
+
+
+def _copy_fd(src: int, dst: int, count: int, offset: Optional[int] = None) -> int:
+    """
+    Copy `count` bytes from `src` at `offset`, or at its current position when `offset`
+    is None, to the current position of `dst`. Try copy_file_range and sendfile first and
+    fall back to a buffered loop only when the kernel refuses them.
+    """
+    copied = 0
+    for copier in (_copy_file_range, _sendfile, _copy_buffered):
+        try:
+            while copied < count:
+                size = copier(
+                    src,
+                    dst,
+                    count - copied,
+                    None if offset is None else offset + copied,
+                )
+                if size == 0:
+                    return copied
+                copied += size
+            return copied
+        except OSError as e:
+            if copier is _copy_buffered or e.errno not in _COPY_FALLBACK_ERRORS:
+                raise
+    return copied
+
+
+def _pwrite(fd: int, data, offset: int) -> None:
+    with memoryview(data) as view:
+        written = 0
+        while written < len(view):
+            if hasattr(os, "pwrite"):
+                written += os.pwrite(fd, view[written:], offset + written)
+            else:
+                os.lseek(fd, offset + written, io.SEEK_SET)
+                written += os.write(fd, view[written:])
+
+
+def _pwrite_file(
+    filename, data, offset: int, sparse: bool = False, eof: int = 0
+) -> None:
+    fd = os.open(filename, os.O_WRONLY | getattr(os, "O_BINARY", 0))
+    try:
+        if not sparse:
+            _pwrite(fd, data, offset)
+            return
+        with memoryview(data) as view:
+            for start, end, zero in _zero_runs(view, offset, eof):
+                if not zero:
+                    _pwrite(fd, view[start:end], offset + start)
+    finally:
+        os.close(fd)
+
+
+def _zero_runs(
+    view: memoryview, offset: int, eof: int = 0
+) -> List[Tuple[int, int, bool]]:
+    """
+    Split `view` to be written at file `offset` into (start, end, is_zero) runs
+    of blocks aligned to BLOCKSIZE in the file. Only zero blocks at or past `eof`
+    are reported as zero, as skipping others would leave old data in place.
+    """
+    runs = []
+    start = pos = 0
+    zero = False
+    while pos < len(view):
+        end = min(pos + BLOCKSIZE - (offset + pos) % BLOCKSIZE, len(view))
+        is_zero = (
+            offset + pos >= eof and view[pos:end].tobytes() == _ZERO_BLOCK[: end - pos]
+        )
+        if is_zero != zero and pos > start:
+            runs.append((start, pos, zero))
+            start = pos
+        zero = is_zero
+        pos = end
+    if pos > start:
+        runs.append((start, pos, zero))
+    return runs
+
+
+def _data_ranges(fd: int, start: int, end: int) -> Iterator[Tuple[int, int]]:
+    """
+    Yield (offset, length) of ranges between `start` and `end` of a file which
+    hold data. Holes are skipped when the platform and file system report them.
+    """
+    if not hasattr(os, "SEEK_DATA"):
+        yield start, end - start
+        return
+    pos = start
+    while pos < end:
+        try:
+            data = os.lseek(fd, pos, os.SEEK_DATA)
+        except OSError as e:
+            if e.errno == errno.ENXIO:
+                # no data after pos
+                return
+            if e.errno in _COPY_FALLBACK_ERRORS:
+                yield pos, end - pos
+                return
+            raise
+        if data >= end:
+            return
+        hole = min(os.lseek(fd, data, os.SEEK_HOLE), end)
+        yield data, hole - data
+        pos = hole
+
+
+def _warm_file(filename, size: int) -> None:
+    """Read head of a file into page cache with a bounded buffer."""
+    buffer = bytearray(min(size, COPY_BUFSIZE))
+    with io.open(filename, mode="rb", buffering=0) as file:
+        while size > 0:
+            count = file.readinto(buffer)
+            if not count:
+                break
+            size -= count
+
+
+def _file_digest(filename, algorithm: str, *digests):
+    """Return digest of a file, also feeding its content to other `digests`."""
+    digest = hashlib.new(algorithm)
+    digests = (digest,) + digests
+    buffer = bytearray(COPY_BUFSIZE)
+    with io.open(filename, mode="rb", buffering=0) as file:
+        pos = 0
+        size = os.fstat(file.fileno()).st_size
+        for offset, length in _data_ranges(file.fileno(), 0, size):
+            # holes are hashed as zeros without reading them
+            _update_zeros(digests, offset - pos)
+            file.seek(offset)
+            while length > 0:
+                with memoryview(buffer)[: min(length, len(buffer))] as view:
+                    count = file.readinto(view)
+                    if not count:
+                        break
+                    for d in digests:
+                        d.update(view[:count])
+                length -= count
+                pos = offset + count
+                offset += count
+        _update_zeros(digests, size - pos)
+    return digest
+
+
+def _update_zeros(digests, size: int) -> None:
+    if size <= 0:
+        return
+    zeros = bytes(min(size, COPY_BUFSIZE))
+    while size > 0:
+        count = min(size, len(zeros))
+        for d in digests:
+            d.update(zeros[:count])
+        size -= count
+
+
+def _write_digest(filename: pathlib.Path, digest) -> None:
+    """Write a sidecar digest file in the format of coreutils sha256sum and friends."""
+    sidecar = filename.with_name(filename.name + "." + digest.name)
+    with io.open(sidecar, mode="w") as file:
+        file.write("{}  {}\n".format(digest.hexdigest(), filename.name))
+
+
+def _check_digest(filename: pathlib.Path, algorithm: str) -> bool:
+    sidecar = filename.with_name(filename.name + "." + algorithm)
+    try:
+        with io.open(sidecar, mode="r") as file:
+            expected = file.read().split(maxsplit=1)[0]
+    except (FileNotFoundError, IndexError):
+        return False
+    return _file_digest(filename, algorithm).hexdigest() == expected
+
+
+def _sync_fd(
+    fd: int, directory: Optional[str] = None, journal=None, entry=None
+) -> None:
+    """Commit data of a duplicated volume fd, and the directory entry, then close it."""
+    try:
+        getattr(os, "fdatasync", os.fsync)(fd)
+    finally:
+        os.close(fd)
+    if directory is not None and hasattr(os, "O_DIRECTORY"):
+        dirfd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dirfd)
+        finally:
+            os.close(dirfd)
+    if journal is not None:
+        # data is durable, record it as committed
+        journal.write(json.dumps(entry) + "\n")
+        journal.flush()
+        getattr(os, "fdatasync", os.fsync)(journal.fileno())
+
+
+def _writev_all(fd: int, buffers: List[memoryview], size: int) -> None:
+    if hasattr(os, "writev"):
+        written = os.writev(fd, buffers)
+    else:
+        written = 0
+    if written < size:
+        with memoryview(b"".join(buffers)) as view:
+            while written < size:
+                written += os.write(fd, view[written:])
+
+
+def _fileno(fd_or_file) -> int:
+    if isinstance(fd_or_file, int):
+        return fd_or_file
+    flush = getattr(fd_or_file, "flush", None)
+    if flush is not None:
+        flush()
+    return fd_or_file.fileno()
+
+
+def _close_map(map: mmap) -> None:
+    try:
+        map.close()
+    except BufferError:
+        # a view returned by MultiVolume.view() is still alive;
+        # the map is unmapped when the last view is released.
+        pass
 
 
 class MultiVolume(io.RawIOBase, contextlib.AbstractContextManager):
@@ -51,168 +554,998 @@ class MultiVolume(io.RawIOBase, contextlib.AbstractContextManager):
         volume: Optional[int] = None,
         ext_digits: Optional[int] = 4,
         hex: Optional[bool] = False,
-        ext_start: Optional[int] = 1
+        ext_start: Optional[int] = 1,
+        max_open_files: int = 64,
+        use_mmap: bool = False,
+        preallocate: bool = False,
+        manifest: bool = False,
+        readahead: int = 0,
+        readahead_size: int = 4 * 1024 * 1024,
+        cache_policy: Optional[str] = None,
+        checksum: Optional[str] = None,
+        block_cache: int = 0,
+        stats: bool = False,
+        stats_hook: Optional[Callable[[str, int, float], None]] = None,
+        durability: bool = False,
+        sync_interval: float = 1.0,
+        sync_bytes: int = 16 * 1024 * 1024,
+        journal: bool = False,
+        sparse: bool = False,
+        directories: Optional[List[Union[pathlib.Path, str]]] = None
     ):
         self._mode = mode
+        self._text = not mode.endswith("b")
         self._closed = False
-        self._files = []  # type: List[object]
+        self._stats = None  # type: Optional[_IOStats]
+        if stats or stats_hook is not None:
+            self._stats = _IOStats(stats_hook)
+        self._pool = _FilePool(self._open_volume, max_open_files, self._close_volume)
+        self._maps = None  # type: Optional[_FilePool]
         self._fileinfo = []  # type: List[_FileInfo]
         self._position = 0
+        self._end = 0
         self._positions = []
+        self._current = 0
         self._digits = ext_digits
         self._start = ext_start
         self._hex = hex
+        self._directories = None  # type: Optional[List[pathlib.Path]]
+        if directories:
+            self._directories = [pathlib.Path(d) for d in directories]
+        if preallocate and mode in ["ab", "a", "at"]:
+            # O_APPEND writes would land after the reserved space
+            raise ValueError("preallocate is not supported in append mode.")
+        self._preallocate = preallocate
+        if sparse and (preallocate or not mode.endswith("b") or mode == "ab"):
+            # appended data would not land after holes with O_APPEND
+            raise ValueError(
+                "sparse is supported only in binary write modes without preallocate."
+            )
+        self._sparse = sparse
+        self._use_manifest = manifest
+        self._readahead = readahead
+        self._readahead_size = readahead_size
+        self._prefetched = 0
+        self._prefetcher = None  # type: Optional[concurrent.futures.ThreadPoolExecutor]
+        self._seeked = False
+        if cache_policy not in CACHE_POLICIES:
+            raise ValueError("Unknown cache_policy {}.".format(cache_policy))
+        self._cache_policy = cache_policy
+        self._drop_mark = 0
+        if checksum is not None:
+            # raise ValueError early for unknown algorithm
+            hashlib.new(checksum)
+        self._checksum = checksum
+        self._volume_digest = None  # type: Any
+        self._stream_digest = None  # type: Any
+        self._digest_index = 0
+        self._hashed = 0
+        self._digest_stale = False
+        self._cache = None  # type: Optional[_BlockCache]
+        if block_cache:
+            if mode not in ["rb", "r"] or use_mmap:
+                raise ValueError("block_cache is supported only in binary read mode.")
+            self._cache = _BlockCache(block_cache)
+        self._syncer = None  # type: Optional[concurrent.futures.ThreadPoolExecutor]
+        self._syncs = collections.deque()  # type: collections.deque
+        self._sync_deferred = False
+        self._sync_interval = sync_interval
+        self._sync_bytes = sync_bytes
+        self._sync_mark = 0
+        self._sync_time = time.monotonic()
+        self._use_journal = journal
+        self._journal_file = None  # type: Any
+        if durability or journal:
+            if mode in ["rb", "r", "rt"]:
+                raise ValueError("durability is supported only in write mode.")
+            self._syncer = concurrent.futures.ThreadPoolExecutor(max_workers=1)
         self.name = str(basename)
+        basename = pathlib.Path(basename)
+        self._manifest = basename.with_name(basename.name + MANIFEST_SUFFIX)
+        self._journal = basename.with_name(basename.name + JOURNAL_SUFFIX)
         if mode in ["rb", "r", "rt"]:
             self._init_reader(basename)
+            if use_mmap:
+                if mode == "rt":
+                    raise ValueError("use_mmap is not supported in text mode.")
+                self._maps = _FilePool(self._map_volume, max_open_files, _close_map)
+        elif use_mmap:
+            raise ValueError("use_mmap is supported only in read mode.")
         elif mode in ["wb", "w", "wt", "xb", "x", "xt", "ab", "a", "at"]:
             if volume is None:
                 self._volume_size = 10 * 1024 * 1024  # set default to 10MBytes
             else:
                 self._volume_size = volume
             self._init_writer(basename)
+            if checksum is not None:
+                self._volume_digest = hashlib.new(checksum)
+                self._stream_digest = hashlib.new(checksum)
+                # appended volumes are hashed again on close
+                self._digest_stale = self._end > 0
         else:
             raise NotImplementedError
 
-    def _glob_files(self, basename):
-        if isinstance(basename, str):
-            basename = pathlib.Path(basename)
-        files = basename.parent.glob(basename.name + ".*")
-        return sorted(files)
+    def _volume_ext(self, num: int) -> str:
+        if self._hex:
+            return "{num:0{ext_digit}x}".format(num=num, ext_digit=self._digits)
+        return "{num:0{ext_digit}d}".format(num=num, ext_digit=self._digits)
+
+    def _volume_number(self, ext: str, digits: int) -> Optional[int]:
+        """
+        Parse volume number from extension zero padded to `digits`, return None
+        when it is not a volume.
+        """
+        if self._hex:
+            if _HEX_EXT.fullmatch(ext) is None:
+                return None
+            num = int(ext, 16)
+        else:
+            if _DECIMAL_EXT.fullmatch(ext) is None:
+                return None
+            num = int(ext)
+        if num < self._start or len(ext) < digits:
+            return None
+        # numbers grown past the digits are not zero padded
+        if len(ext) > digits and ext[0] == "0":
+            return None
+        return num
+
+    def _volume_dir(self, index: int) -> pathlib.Path:
+        """Return directory of volume `index`, striped round-robin over `directories`."""
+        if self._directories is None:
+            return pathlib.Path(self.name).parent
+        return self._directories[index % len(self._directories)]
+
+    def _volume_path(self, basename: pathlib.Path, num: int) -> pathlib.Path:
+        name = basename.name + "." + self._volume_ext(num)
+        return self._volume_dir(num - self._start).joinpath(name)
+
+    def _scan_files(self, basename):
+        """
+        Return list of volume paths and their stat in volume number order,
+        with one stat call per volume. Files which do not have a volume number
+        as extension are ignored.
+        """
+        prefix = basename.name + "."
+        candidates = []
+        for directory in self._directories or [basename.parent]:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.name.startswith(prefix) and entry.is_file():
+                        ext = entry.name[len(prefix) :]
+                        candidates.append((ext, directory, entry))
+        # a set written with other digits is read with the width of its first volume
+        digits = self._digits
+        first = [
+            ext
+            for ext, _, _ in candidates
+            if self._volume_number(ext, len(ext)) == self._start
+        ]
+        if first and self._volume_ext(self._start) not in first:
+            digits = min(len(ext) for ext in first)
+        found = {}
+        for ext, directory, entry in candidates:
+            num = self._volume_number(ext, digits)
+            if num is None:
+                continue
+            if num not in found or ext == self._volume_ext(num):
+                found[num] = (directory, entry)
+        for num in range(self._start, self._start + len(found)):
+            if num not in found:
+                raise FileNotFoundError(
+                    "Volume {}{} is missing.".format(prefix, self._volume_ext(num))
+                )
+        return [
+            (found[num][0].joinpath(found[num][1].name), found[num][1].stat())
+            for num in range(self._start, self._start + len(found))
+        ]
 
     def _init_reader(self, basename):
         pos = 0
         self._positions.append(pos)
-        filenames = self._glob_files(basename)
-        for name in filenames:
-            stat = os.stat(name)
-            size = os.stat(name).st_size
-            self._fileinfo.append(_FileInfo(name, stat, size))
-            self._files.append(io.open(name, mode=self._mode))
-            pos += size
+        if self._use_manifest and self._load_manifest():
+            return
+        for name, stat in self._scan_files(basename):
+            self._fileinfo.append(_FileInfo(name, stat, stat.st_size))
+            pos += stat.st_size
             self._positions.append(pos)
 
+    def _load_manifest(self) -> bool:
+        try:
+            with io.open(self._manifest, mode="r", encoding="utf-8") as file:
+                manifest = json.load(file)
+        except FileNotFoundError:
+            return False
+        pos = 0
+        for index, volume in enumerate(manifest["volumes"]):
+            filename = self._volume_dir(index).joinpath(volume["name"])
+            self._fileinfo.append(
+                _FileInfo(filename, None, volume["size"], volume["mtime_ns"])
+            )
+            pos += volume["size"]
+            self._positions.append(pos)
+        return True
+
+    def _save_manifest(self) -> None:
+        volumes = []
+        for info in self._fileinfo:
+            stat = os.stat(info.filename)
+            volumes.append(
+                {
+                    "name": info.filename.name,
+                    "size": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns,
+                }
+            )
+        # temporary name should not look like a volume
+        temp = self._manifest.with_name("." + self._manifest.name + ".tmp")
+        with io.open(temp, mode="w", encoding="utf-8") as file:
+            json.dump({"version": 1, "volumes": volumes}, file)
+        os.replace(temp, self._manifest)
+
+    def _check_volume(self, index: int, fd: int) -> None:
+        """Verify a volume listed in manifest on its first access."""
+        info = self._fileinfo[index]
+        if info.stat is not None or info.mtime_ns is None:
+            return
+        stat = os.fstat(fd)
+        if stat.st_size != info.size or stat.st_mtime_ns != info.mtime_ns:
+            raise RuntimeError(
+                "Volume {} does not match manifest.".format(info.filename)
+            )
+        info.stat = stat
+
     def _init_writer(self, basename):
         if isinstance(basename, str):
             basename = pathlib.Path(basename)
-        ext = ".{num:0{ext_digit}d}".format(num=self._start, ext_digit=self._digits)
-        target = basename.with_name(basename.name + ext)
+        target = self._volume_path(basename, self._start)
+        journal_exists = self._use_journal and self._journal.exists()
+        resumed = False
         if target.exists():
             if self._mode in ["x", "xb", "xt"]:
                 raise FileExistsError
             elif self._mode in ["w", "wb", "wt"]:
-                file = io.open(target, mode=self._mode)
-                self._files.append(file)
-                file.truncate(0)
-                stat = os.stat(target)
-                self._fileinfo.append(_FileInfo(target, stat, self._volume_size))
+                self._create_volume(target)
                 self._positions = [0, self._volume_size]
+            elif self._mode in ["a", "ab", "at"] and journal_exists:
+                self._resume(basename)
+                resumed = True
             elif self._mode in ["a", "ab", "at"]:
-                filenames = self._glob_files(basename)
-                if self._mode == "ab":
-                    mode = "rb"
-                else:
-                    mode = "r"
                 pos = 0
                 size = 0
                 self._positions = [0]
-                for i in range(len(filenames)):
-                    file = io.open(filenames[i], mode)
-                    self._files.append(file)
-                    stat = filenames[i].stat()
+                for name, stat in self._scan_files(basename):
                     size = stat.st_size
-                    self._fileinfo.append(_FileInfo(filenames[i], stat, size))
+                    self._fileinfo.append(_FileInfo(name, stat, size))
                     pos += size
                     self._positions.append(pos)
                     self._position = pos
+                self._end = pos
                 # last file
                 if size >= self._volume_size:
                     self._add_volume()
                 else:
-                    self._files[-1].close()
-                    self._files[-1] = io.open(
-                        filenames[len(filenames) - 1], mode=self._mode
-                    )
+                    # last volume is filled up to its capacity, as _add_volume() does
+                    self._positions[-1] = self._positions[-2] + self._volume_size
             else:
                 raise NotImplementedError
         else:
-            file = io.open(target, mode=self._mode)
-            self._files.append(file)
-            self._fileinfo.append(_FileInfo(target, os.stat(target), self._volume_size))
+            self._create_volume(target)
             self._positions = [0, self._volume_size]
+        # existing manifest becomes stale
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self._manifest)
+        if self._use_journal:
+            # entries of an earlier run are kept only when resuming it
+            mode = "a" if resumed else "w"
+            self._journal_file = io.open(self._journal, mode=mode, encoding="utf-8")
+
+    def _resume(self, basename: pathlib.Path) -> None:
+        """
+        Resume an interrupted write from the last committed byte in journal.
+        Finished volumes are not opened; the torn tail of the last volume and
+        volumes after it are dropped.
+        """
+        sizes = {}  # type: Dict[int, int]
+        with io.open(self._journal, mode="r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # torn last entry
+                    break
+                sizes[entry["index"]] = entry["size"]
+        if len(sizes) == 0:
+            sizes[0] = 0
+        # drop the torn entry, so that new entries are not appended to it
+        temp = self._journal.with_name("." + self._journal.name + ".tmp")
+        with io.open(temp, mode="w", encoding="utf-8") as file:
+            for index in range(len(sizes)):
+                file.write(json.dumps({"index": index, "size": sizes[index]}) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp, self._journal)
+        pos = 0
+        self._positions = [0]
+        for index in range(len(sizes)):
+            num = self._start + index
+            filename = self._volume_path(basename, num)
+            self._fileinfo.append(_FileInfo(filename, None, sizes[index]))
+            pos += sizes[index]
+            self._positions.append(pos)
+        last = self._fileinfo[-1]
+        os.truncate(last.filename, last.size)
+        last.stat = os.stat(last.filename)
+        num = self._start + len(sizes)
+        while True:
+            torn = self._volume_path(basename, num)
+            if not torn.exists():
+                break
+            os.unlink(torn)
+            num += 1
+        self._position = self._end = self._sync_mark = pos
+        if last.size >= self._volume_size:
+            # last volume is already committed
+            self._sync_deferred = True
+            self._add_volume()
+            self._sync_deferred = False
+        else:
+            self._positions[-1] = self._positions[-2] + self._volume_size
+
+    def _create_volume(self, target: pathlib.Path) -> None:
+        file = io.open(target, mode=self._mode)
+        if self._stats is not None:
+            self._stats.count("files_opened")
+        self._advise_open(file.fileno())
+        if self._preallocate and hasattr(os, "posix_fallocate"):
+            os.posix_fallocate(file.fileno(), 0, self._volume_size)
+        stat = os.fstat(file.fileno())
+        self._fileinfo.append(_FileInfo(target, stat, self._volume_size))
+        self._pool.put(len(self._fileinfo) - 1, file)
+
+    def _open_volume(self, index: int):
+        filename = self._fileinfo[index].filename
+        if self._mode in ["w", "wb", "wt", "x", "xb", "xt"]:
+            # volume is already created, reopen it without truncation
+            mode = "r+b" if self._mode.endswith("b") else "r+"
+        elif self._mode in ["a", "ab", "at"] and index < len(self._fileinfo) - 1:
+            mode = "rb" if self._mode == "ab" else "r"
+        else:
+            mode = self._mode
+        file = io.open(filename, mode=mode)
+        if self._stats is not None:
+            self._stats.count("files_opened")
+        try:
+            self._check_volume(index, file.fileno())
+        except RuntimeError:
+            file.close()
+            raise
+        self._advise_open(file.fileno())
+        return file
+
+    def _close_volume(self, file) -> None:
+        if self._stats is not None:
+            self._stats.count("files_closed")
+        file.close()
+
+    def _file(self, index: int):
+        return self._pool.get(index)
+
+    def _map_volume(self, index: int) -> mmap:
+        if self._stats is not None:
+            self._stats.count("files_opened")
+            self._stats.count("files_closed")
+        with io.open(self._fileinfo[index].filename, mode="rb") as file:
+            self._check_volume(index, file.fileno())
+            self._advise_open(file.fileno())
+            return mmap(file.fileno(), 0, access=ACCESS_READ)
+
+    def _locate(self, position: int) -> int:
+        """Return index of the volume that holds logical `position`."""
+        i = bisect.bisect_right(self._positions, position) - 1
+        return max(0, min(i, len(self._fileinfo) - 1))
+
+    def _current_volume(self) -> int:
+        i = self._current
+        # sequential I/O stays in the cached volume and skips lookup
+        if not (
+            i < len(self._fileinfo)
+            and self._positions[i] <= self._position < self._positions[i + 1]
+        ):
+            if self._position >= self._positions[-1]:
+                return len(self._fileinfo) - 1
+            i = self._locate(self._position)
+            if self._stats is not None and i != self._current:
+                self._stats.count("volume_switches")
+            self._current = i
+        return i
 
     def _current_index(self):
-        for i in range(len(self._positions) - 1):
-            if self._positions[i] <= self._position < self._positions[i + 1]:
-                pos = self._files[i].tell()
-                offset = self._position - self._positions[i]
-                if pos != offset:
-                    self._files[i].seek(offset, io.SEEK_SET)
-                return i
-        return len(self._files) - 1
+        i = self._current_volume()
+        file = self._file(i)
+        # a volume reopened by the pool starts at 0, position at the end too
+        offset = min(self._position, self._positions[i + 1]) - self._positions[i]
+        if file.tell() != offset:
+            if self._stats is not None:
+                self._stats.count("seeks")
+            file.seek(offset, io.SEEK_SET)
+        return i
 
     def read(self, size: int = -1) -> bytes:
-        if size == -1:
+        if size is None or size < 0:
             return self.readall()
-        current = self._current_index()
-        file = self._files[current]
-        data = file.read(size)
-        self._position += len(data)
+        start = time.perf_counter() if self._stats is not None else 0.0
+        chunks = []
+        while size > 0:
+            if self._readahead:
+                self._read_ahead(size)
+            if self._cache is not None:
+                data = self._pread(self._position, size)
+            elif self._maps is not None:
+                data = self._read_mapped(size)
+            else:
+                current = self._current_index()
+                data = self._file(current).read(size)
+            if len(data) == 0:
+                break
+            self._position += len(data)
+            size -= len(data)
+            chunks.append(data)
+        if self._cache_policy is not None:
+            self._drop_cache()
+        data = self._join(chunks)
+        if self._stats is not None:
+            self._stats.record("read", len(data), start)
         return data
 
+    def _join(self, chunks: list) -> Any:
+        """Join chunks read across volumes, they are str in text mode."""
+        if len(chunks) == 1:
+            return chunks[0]
+        return ("" if self._text else b"").join(chunks)
+
     def readall(self) -> bytes:
-        result = b""
-        data = self.read(BLOCKSIZE)
-        while len(data) > 0:
-            result += data
-            data = self.read(BLOCKSIZE)
-        return result
+        size = self._positions[-1] - self._position
+        if self._text:
+            # text has no more characters than bytes, read fills across volumes
+            return self.read(max(size, 0))
+        if size <= 0:
+            return b""
+        result = bytearray(size)
+        length = self.readinto(result)
+        with memoryview(result) as view:
+            return bytes(view[:length])
 
     def readinto(self, b: Union[bytearray, memoryview, Container[Any], mmap]) -> int:
-        size = len(b)
-        data = self.read(size)
-        b[: len(data)] = data
-        return len(data)
+        start = time.perf_counter() if self._stats is not None else 0.0
+        length = 0
+        with memoryview(b) as view, view.cast("B") as target:
+            size = len(target)
+            while length < size:
+                if self._readahead:
+                    self._read_ahead(size - length)
+                if self._cache is not None:
+                    count = self._preadinto(self._position, target[length:])
+                elif self._maps is not None:
+                    count = self._readinto_mapped(target[length:])
+                else:
+                    current = self._current_index()
+                    count = self._file(current).readinto(target[length:])
+                if not count:
+                    break
+                self._position += count
+                length += count
+        if self._cache_policy is not None:
+            self._drop_cache()
+        if self._stats is not None:
+            self._stats.record("readinto", length, start)
+        return length
+
+    def _read_ahead(self, size: int) -> None:
+        """
+        Prefetch following volumes when sequential read of `size` bytes comes
+        within `readahead_size` bytes of the end of current volume.
+        """
+        if self._seeked:
+            # random access, wait for the next read to continue sequentially
+            self._seeked = False
+            self._prefetched = 0
+            return
+        if self._position >= self._positions[-1]:
+            return
+        current = self._current_volume()
+        remains = self._positions[current + 1] - self._position - size
+        if remains > self._readahead_size:
+            return
+        last = min(current + self._readahead, len(self._fileinfo) - 1)
+        for index in range(max(current + 1, self._prefetched), last + 1):
+            self._prefetch(index)
+        self._prefetched = max(self._prefetched, last + 1)
+
+    def _prefetch(self, index: int) -> None:
+        filename = self._fileinfo[index].filename
+        size = min(self._fileinfo[index].size, self._readahead_size)
+        if hasattr(os, "posix_fadvise"):
+            fd = os.open(filename, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, size, os.POSIX_FADV_WILLNEED)
+            finally:
+                os.close(fd)
+        else:
+            if self._prefetcher is None:
+                self._prefetcher = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+            self._prefetcher.submit(_warm_file, filename, size)
+
+    def _segments(self, offset: int, size: int):
+        """Split logical range into (volume index, offset in volume, size) tuples."""
+        end = min(offset + size, self._positions[-1])
+        while offset < end:
+            current = self._locate(offset)
+            count = min(end, self._positions[current + 1]) - offset
+            yield current, offset - self._positions[current], count
+            offset += count
+
+    def pread(self, offset: int, size: int) -> bytes:
+        """
+        Read up to `size` bytes at logical `offset` without touching current position.
+        It is safe to call from multiple threads concurrently.
+        """
+        if self._stats is None:
+            return self._pread(offset, size)
+        start = time.perf_counter()
+        data = self._pread(offset, size)
+        self._stats.record("pread", len(data), start)
+        return data
+
+    def read_ranges(
+        self, ranges: List[Tuple[int, int]], gap: int = BLOCKSIZE, workers: int = 1
+    ) -> List[bytes]:
+        """
+        Read many (offset, length) ranges without touching current position.
+        Ranges closer than `gap` bytes are merged into one positional read per volume,
+        and reads are issued by `workers` threads, so that volumes striped over several
+        directories are read at once. Return data in the order of `ranges`.
+        """
+        start = time.perf_counter() if self._stats is not None else 0.0
+        order = sorted(range(len(ranges)), key=lambda i: ranges[i][0])
+        spans = []  # type: List[List[int]]
+        owners = [0] * len(ranges)
+        for i in order:
+            offset, length = ranges[i]
+            if spans and offset <= spans[-1][1] + gap:
+                spans[-1][1] = max(spans[-1][1], offset + length)
+            else:
+                spans.append([offset, offset + length])
+            owners[i] = len(spans) - 1
+        if workers > 1:
+            segments = [list(self._segments(s, e - s)) for s, e in spans]
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    [executor.submit(self._pread_volume, *segment) for segment in span]
+                    for span in segments
+                ]
+                chunks = [b"".join(f.result() for f in span) for span in futures]
+        else:
+            chunks = [self._pread(offset, end - offset) for offset, end in spans]
+        result = []
+        for (offset, length), owner in zip(ranges, owners):
+            begin = offset - spans[owner][0]
+            result.append(chunks[owner][begin : begin + length])
+        if self._stats is not None:
+            self._stats.record("read_ranges", sum(len(r) for r in result), start)
+        return result
+
+    def _pread(self, offset: int, size: int) -> bytes:
+        chunks = []
+        for index, start, count in self._segments(offset, size):
+            data = self._pread_volume(index, start, count)
+            chunks.append(data)
+            if len(data) < count:
+                break
+        if len(chunks) == 1:
+            return chunks[0]
+        return b"".join(chunks)
+
+    def preadinto(
+        self, offset: int, b: Union[bytearray, memoryview, Container[Any], mmap]
+    ) -> int:
+        """
+        Read into `b` at logical `offset` without touching current position.
+        It is safe to call from multiple threads concurrently.
+        """
+        if self._stats is None:
+            return self._preadinto(offset, b)
+        start = time.perf_counter()
+        length = self._preadinto(offset, b)
+        self._stats.record("preadinto", length, start)
+        return length
+
+    def _preadinto(
+        self, offset: int, b: Union[bytearray, memoryview, Container[Any], mmap]
+    ) -> int:
+        length = 0
+        with memoryview(b) as view, view.cast("B") as target:
+            for index, start, count in self._segments(offset, len(target)):
+                size = self._preadinto_volume(
+                    index, start, target[length : length + count]
+                )
+                length += size
+                if size < count:
+                    break
+        return length
+
+    def _pread_volume(self, index: int, offset: int, size: int) -> bytes:
+        if self._cache is not None:
+            buffer = bytearray(size)
+            with memoryview(buffer) as view:
+                length = self._readinto_blocks(index, offset, view)
+            del buffer[length:]
+            return bytes(buffer)
+        return self._pread_raw(index, offset, size)
+
+    def _pread_raw(self, index: int, offset: int, size: int) -> bytes:
+        if self._maps is not None:
+            map = self._maps.acquire(index)
+            try:
+                return map[offset : offset + size]
+            finally:
+                self._maps.release(index)
+        if not hasattr(os, "pread"):
+            with io.open(self._fileinfo[index].filename, mode="rb") as file:
+                file.seek(offset)
+                return file.read(size)
+        file = self._pool.acquire(index)
+        try:
+            return os.pread(file.fileno(), size, offset)
+        finally:
+            self._pool.release(index)
+
+    def _preadinto_volume(self, index: int, offset: int, target: memoryview) -> int:
+        if self._cache is not None:
+            return self._readinto_blocks(index, offset, target)
+        if self._maps is not None:
+            map = self._maps.acquire(index)
+            try:
+                with memoryview(map) as view:
+                    size = max(min(len(target), len(view) - offset), 0)
+                    target[:size] = view[offset : offset + size]
+                return size
+            finally:
+                self._maps.release(index)
+        if not hasattr(os, "preadv"):
+            data = self._pread_raw(index, offset, len(target))
+            target[: len(data)] = data
+            return len(data)
+        file = self._pool.acquire(index)
+        try:
+            return os.preadv(file.fileno(), [target], offset)
+        finally:
+            self._pool.release(index)
+
+    def _volume_block_size(self, index: int) -> int:
+        return CACHE_BLOCKSIZE
+
+    def _load_block(self, index: int, block: int) -> bytes:
+        size = self._volume_block_size(index)
+        return self._pread_raw(index, block * size, size)
+
+    def _block(self, index: int, block: int) -> bytes:
+        """Return `block` of volume `index` through the block cache."""
+        key = (index, block)
+        data = self._cache.get(key)
+        if data is None:
+            data = self._load_block(index, block)
+            self._cache.put(key, data)
+        return data
+
+    def _readinto_blocks(self, index: int, offset: int, target: memoryview) -> int:
+        block_size = self._volume_block_size(index)
+        end = min(offset + len(target), self._fileinfo[index].size)
+        length = 0
+        while offset < end:
+            block, start = divmod(offset, block_size)
+            data = self._block(index, block)
+            count = min(len(data) - start, end - offset)
+            if count <= 0:
+                break
+            target[length : length + count] = data[start : start + count]
+            offset += count
+            length += count
+        return length
+
+    def _readline_blocks(self, size: int) -> bytes:
+        """Read a line up to `size` bytes from a block; it stops at end of the block."""
+        if self._position >= self._positions[-1]:
+            return b""
+        current = self._locate(self._position)
+        block, start = divmod(
+            self._position - self._positions[current], self._volume_block_size(current)
+        )
+        data = self._block(current, block)
+        end = data.find(b"\n", start)
+        end = len(data) if end < 0 else end + 1
+        if size > 0:
+            end = min(end, start + size)
+        return data[start:end]
+
+    def _read_mapped(self, size: int) -> bytes:
+        if self._position >= self._positions[-1]:
+            return b""
+        current = self._current_volume()
+        offset = self._position - self._positions[current]
+        size = min(size, self._positions[current + 1] - self._position)
+        return self._maps.get(current)[offset : offset + size]
+
+    def _readinto_mapped(self, target: memoryview) -> int:
+        if self._position >= self._positions[-1]:
+            return 0
+        current = self._current_volume()
+        offset = self._position - self._positions[current]
+        size = min(len(target), self._positions[current + 1] - self._position)
+        with memoryview(self._maps.get(current)) as view:
+            target[:size] = view[offset : offset + size]
+        return size
+
+    def view(self, offset: int, size: int) -> memoryview:
+        """
+        Return a read-only memoryview of `size` bytes at logical `offset`
+        without copying. Available only with `use_mmap=True` and the range
+        should sit inside one volume. The volume stays mapped while the
+        returned view is alive.
+        """
+        if self._maps is None:
+            raise RuntimeError("view() requires use_mmap=True.")
+        if size == 0:
+            return memoryview(b"")
+        current = self._locate(offset)
+        start = offset - self._positions[current]
+        if start < 0 or offset + size > self._positions[current + 1]:
+            raise ValueError("Requested range does not sit inside one volume.")
+        return memoryview(self._maps.get(current))[start : start + size]
 
     def write(
         self, b: Union[bytes, bytearray, memoryview, Container[Any], mmap]
     ) -> None:
-        current = self._current_index()
-        file = self._files[current]
-        pos = file.tell()
-        if pos + len(b) > self._volume_size:
-            file.write(b[: self._volume_size - pos])
-            self._position += self._volume_size - pos
-            if current == len(self._files) - 1:
+        start = time.perf_counter() if self._stats is not None else 0.0
+        if isinstance(b, str):
+            self._digest_stale = True
+            self._write(b)
+            size = len(b)
+        else:
+            with memoryview(b) as view, view.cast("B") as data:
+                self._write(data)
+                size = len(data)
+        self._after_write()
+        if self._stats is not None:
+            self._stats.record("write", size, start)
+
+    def _write(self, data) -> None:
+        while True:
+            current = self._current_index()
+            file = self._file(current)
+            room = max(self._volume_size - file.tell(), 0)
+            if len(data) <= room:
+                self._update_digest(current, data)
+                self._write_file(current, file, data)
+                self._position += len(data)
+                return
+            self._update_digest(current, data[:room])
+            self._write_file(current, file, data[:room])
+            self._position += room
+            data = data[room:]
+            if current == len(self._fileinfo) - 1:
                 self._add_volume()
-            file = self._files[current + 1]
-            file.seek(0)
-            self.write(b[self._volume_size - pos :])  # recursive call
+
+    def _write_file(self, index: int, file, data) -> None:
+        if not self._sparse or isinstance(data, str):
+            file.write(data)
+            return
+        for start, end, zero in _zero_runs(data, file.tell(), self._volume_end(index)):
+            if zero:
+                # leave a hole, volume size is fixed on rollover and close
+                file.seek(end - start, io.SEEK_CUR)
+            else:
+                file.write(data[start:end])
+
+    def _volume_end(self, index: int) -> int:
+        """Return size of volume `index` written by former writes, holes at the end included."""
+        return max(self._end - self._positions[index], 0)
+
+    def _extend_volume(self, index: int, size: int) -> None:
+        """Extend a sparse volume which ends with a hole to `size` bytes."""
+        file = self._file(index)
+        file.flush()
+        if os.fstat(file.fileno()).st_size < size:
+            os.ftruncate(file.fileno(), size)
+
+    def write_parallel(self, source, workers: Optional[int] = None) -> int:
+        """
+        Write a bytes-like object or whole content of readable `source` from current position.
+        Data is cut into volume-sized segments which are written concurrently with
+        positional writes by `workers` threads. Return written size.
+        """
+        if not self.writable():
+            raise RuntimeError("write_parallel() is supported only in write mode.")
+        start = time.perf_counter() if self._stats is not None else 0.0
+        for file in self._pool.files():
+            file.flush()
+        first = self._current_volume()
+        self._sync_deferred = self._syncer is not None
+        limit = 2 * (workers or os.cpu_count() or 1)
+        pending = collections.deque()  # type: collections.deque
+        written = 0
+        with contextlib.ExitStack() as stack, concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers
+        ) as executor:
+            if hasattr(source, "read"):
+                view = None
+            else:
+                view = stack.enter_context(
+                    stack.enter_context(memoryview(source)).cast("B")
+                )
+            while True:
+                current = self._current_volume()
+                offset = self._position - self._positions[current]
+                room = self._volume_size - offset
+                if room <= 0:
+                    if current == len(self._fileinfo) - 1:
+                        self._add_volume()
+                    continue
+                if view is None:
+                    data = source.read(room)
+                else:
+                    data = view[written : written + room]
+                if len(data) == 0:
+                    break
+                filename = self._fileinfo[current].filename
+                self._update_digest(current, data)
+                eof = self._volume_end(current)
+                pending.append(
+                    executor.submit(
+                        _pwrite_file, filename, data, offset, self._sparse, eof
+                    )
+                )
+                self._position += len(data)
+                written += len(data)
+                while len(pending) > limit:
+                    pending.popleft().result()
+            while pending:
+                pending.popleft().result()
+        if self._sparse:
+            last = len(self._fileinfo) - 1
+            self._extend_volume(last, self._position - self._positions[last])
+        if self._syncer is not None:
+            # volumes completed while positional writes were in flight
+            self._sync_deferred = False
+            for index in range(first, len(self._fileinfo) - 1):
+                self._sync_volume(index)
+        self._after_write()
+        if self._stats is not None:
+            self._stats.record("write_parallel", written, start)
+        return written
+
+    def _after_write(self) -> None:
+        if self._position > self._end:
+            self._end = self._position
+        if self._cache_policy is not None:
+            self._drop_cache()
+        if self._syncer is not None:
+            if (
+                self._position - self._sync_mark >= self._sync_bytes
+                or time.monotonic() - self._sync_time >= self._sync_interval
+            ):
+                self._sync_volume(self._current_volume())
+
+    def _sync_volume(self, index: int, directory: bool = False) -> None:
+        """Flush volume `index` and fdatasync it in background with a duplicated fd."""
+        if self._sync_deferred:
+            return
+        while self._syncs and self._syncs[0].done():
+            # raise errors of finished syncs early
+            self._syncs.popleft().result()
+        file = self._file(index)
+        file.flush()
+        parent = str(self._fileinfo[index].filename.parent) if directory else None
+        fd = os.dup(file.fileno())
+        end = max(self._end, self._position)
+        size = min(end, self._positions[index + 1]) - self._positions[index]
+        entry = {"index": index, "size": max(size, 0)}
+        self._syncs.append(
+            self._syncer.submit(_sync_fd, fd, parent, self._journal_file, entry)
+        )
+        self._sync_mark = self._position
+        self._sync_time = time.monotonic()
+
+    def _wait_syncs(self) -> None:
+        while self._syncs:
+            self._syncs.popleft().result()
+
+    def _advise_open(self, fd: int) -> None:
+        if self._cache_policy == "stream" and hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+
+    def _drop_cache(self, force: bool = False) -> None:
+        """
+        Drop page cache of the range between last drop and current position,
+        once it grows to CACHE_DROP_SIZE or crosses a volume boundary.
+        """
+        start, end = self._drop_mark, self._position
+        if end <= start:
+            self._drop_mark = end
+            return
+        if not force and end - start < CACHE_DROP_SIZE:
+            if end < self._positions[self._locate(start) + 1]:
+                return
+        for index, offset, count in self._segments(start, end - start):
+            self._drop_volume_cache(index, offset, count)
+        self._drop_mark = end
+
+    def _drop_volume_cache(self, index: int, offset: int, count: int) -> None:
+        if not hasattr(os, "posix_fadvise"):
+            return
+        file = self._pool.peek(index)
+        if file is not None:
+            if self.writable():
+                file.flush()
+            fd = file.fileno()
+        else:
+            fd = os.open(self._fileinfo[index].filename, os.O_RDONLY)
+        try:
+            if self.writable():
+                # dirty pages are not dropped until written back
+                os.fdatasync(fd)
+            os.posix_fadvise(fd, offset, count, os.POSIX_FADV_DONTNEED)
+        finally:
+            if file is None:
+                os.close(fd)
+
+    def _update_digest(self, index: int, data) -> None:
+        """Hash `data` about to be written at current position of volume `index`."""
+        if self._stream_digest is None or self._digest_stale:
+            return
+        if self._position != self._hashed or index != self._digest_index:
+            # not a sequential write, fall back to hash volumes on close
+            self._digest_stale = True
+            return
+        self._volume_digest.update(data)
+        self._stream_digest.update(data)
+        self._hashed += len(data)
+
+    def _save_digests(self) -> None:
+        """Write sidecar digests of the last volume and of whole stream."""
+        if self._digest_stale:
+            # hash all volumes again in one pass
+            self._stream_digest = hashlib.new(self._checksum)
+            for info in self._fileinfo:
+                digest = _file_digest(
+                    info.filename, self._checksum, self._stream_digest
+                )
+                _write_digest(info.filename, digest)
         else:
-            file.write(b)
-            self._position += len(b)
+            filename = self._fileinfo[self._digest_index].filename
+            _write_digest(filename, self._volume_digest)
+        _write_digest(pathlib.Path(self.name), self._stream_digest)
 
     def _add_volume(self):
+        if self._stream_digest is not None and not self._digest_stale:
+            if self._hashed == self._position:
+                # last volume is complete, emit its digest
+                filename = self._fileinfo[self._digest_index].filename
+                _write_digest(filename, self._volume_digest)
+                self._volume_digest = hashlib.new(self._checksum)
+                self._digest_index += 1
+            else:
+                self._digest_stale = True
+        if self._sparse:
+            last = len(self._fileinfo) - 1
+            self._extend_volume(last, self._position - self._positions[last])
+        if self._syncer is not None:
+            # last volume is complete, commit it in background
+            self._sync_volume(len(self._fileinfo) - 1, directory=True)
         num = len(self._fileinfo) + self._start - 1
-        if self._hex:
-            last = self._fileinfo[-1].filename
-            last_ext = ".{num:0{ext_digit}x}".format(num=num, ext_digit=self._digits)
-            assert last.suffix.endswith(last_ext)
-            next_ext = ".{num:0{ext_digit}x}".format(
-                num=num + 1, ext_digit=self._digits
-            )
-            next = last.with_suffix(next_ext)
-        else:
-            last = self._fileinfo[-1].filename
-            last_ext = ".{num:0{ext_digit}d}".format(num=num, ext_digit=self._digits)
-            assert last.suffix.endswith(last_ext)
-            next_ext = ".{num:0{ext_digit}d}".format(
-                num=num + 1, ext_digit=self._digits
-            )
-            next = last.with_suffix(next_ext)
-        self._files.append(io.open(next, self._mode))
-        stat = os.stat(next)
-        self._fileinfo.append(_FileInfo(next, stat, self._volume_size))
+        last = self._fileinfo[-1].filename
+        assert last.suffix == "." + self._volume_ext(num)
+        self._create_volume(self._volume_path(pathlib.Path(self.name), num + 1))
         pos = self._positions[-1]
         if pos != self._position:
             self._positions[-1] = self._position
@@ -222,13 +1555,167 @@ class MultiVolume(io.RawIOBase, contextlib.AbstractContextManager):
         if self._closed:
             return
         self._closed = True
-        for file in self._files:
-            file.close()
+        if self._cache is not None:
+            self._cache.clear()
+        if self._cache_policy is not None:
+            self._position = max(self._position, self._end)
+            self._drop_cache(force=True)
+        if self._preallocate and self.writable():
+            # drop preallocated space behind written data
+            last = len(self._fileinfo) - 1
+            self._file(last).truncate(max(self._end - self._positions[last], 0))
+        if self._sparse and self.writable():
+            last = len(self._fileinfo) - 1
+            self._extend_volume(last, max(self._end - self._positions[last], 0))
+        if self._syncer is not None:
+            try:
+                self._sync_deferred = False
+                self._sync_volume(len(self._fileinfo) - 1, directory=True)
+                self._wait_syncs()
+            finally:
+                self._syncer.shutdown()
+            if self._journal_file is not None:
+                # write is complete, nothing to resume
+                self._journal_file.close()
+                os.unlink(self._journal)
+        self._pool.close()
+        if self._maps is not None:
+            self._maps.close()
+        if self._prefetcher is not None:
+            self._prefetcher.shutdown()
+        if self._stream_digest is not None:
+            self._save_digests()
+        if self._use_manifest and self.writable():
+            self._save_manifest()
 
     @property
     def closed(self) -> bool:
         return self._closed
 
+    def copy_to(
+        self, fd_or_file, offset: Optional[int] = None, length: Optional[int] = None
+    ) -> int:
+        """
+        Copy `length` bytes from logical `offset` to `fd_or_file` in kernel when possible.
+        When `offset` is None, copy from current position and advance it.
+        Copy to the end of volumes when `length` is None. Return copied size.
+        """
+        if not self.readable():
+            raise RuntimeError("copy_to() is supported only in read mode.")
+        start = time.perf_counter() if self._stats is not None else 0.0
+        position = self._position if offset is None else offset
+        end = (
+            self._positions[-1]
+            if length is None
+            else min(position + length, self._positions[-1])
+        )
+        dst = _fileno(fd_or_file)
+        copied = 0
+        while position < end:
+            current = self._locate(position)
+            size = min(end, self._positions[current + 1]) - position
+            src = self._file(current).fileno()
+            count = _copy_fd(src, dst, size, position - self._positions[current])
+            position += count
+            copied += count
+            if count < size:
+                break
+        if offset is None:
+            self._position = position
+        if isinstance(fd_or_file, io.IOBase) and fd_or_file.seekable():
+            fd_or_file.seek(os.lseek(dst, 0, io.SEEK_CUR), io.SEEK_SET)
+        if self._stats is not None:
+            self._stats.record("copy_to", copied, start)
+        return copied
+
+    def copy_from(self, fd_or_file, length: Optional[int] = None) -> int:
+        """
+        Copy `length` bytes, or until EOF when `length` is None, from `fd_or_file` to
+        current position in kernel when possible. Return copied size.
+        """
+        if not self.writable():
+            raise RuntimeError("copy_from() is supported only in write mode.")
+        start = time.perf_counter() if self._stats is not None else 0.0
+        if isinstance(fd_or_file, io.IOBase) and fd_or_file.seekable():
+            offset = fd_or_file.tell()  # type: Optional[int]
+        else:
+            offset = None
+        src = _fileno(fd_or_file)
+        copied = 0
+        while length is None or copied < length:
+            current = self._current_index()
+            file = self._file(current)
+            file.flush()
+            pos = file.tell()
+            room = self._volume_size - pos
+            if room <= 0:
+                if current == len(self._fileinfo) - 1:
+                    self._add_volume()
+                continue
+            size = room if length is None else min(room, length - copied)
+            # data does not pass through user space, hash it on close
+            self._digest_stale = True
+            dst = file.fileno()
+            os.lseek(dst, pos, io.SEEK_SET)
+            count = _copy_fd(
+                src, dst, size, None if offset is None else offset + copied
+            )
+            file.seek(pos + count, io.SEEK_SET)
+            self._position += count
+            copied += count
+            if count < size:
+                break
+        self._after_write()
+        if offset is not None:
+            fd_or_file.seek(offset + copied, io.SEEK_SET)
+        if self._stats is not None:
+            self._stats.record("copy_from", copied, start)
+        return copied
+
+    def data_ranges(
+        self, offset: int = 0, length: Optional[int] = None
+    ) -> Iterator[Tuple[int, int]]:
+        """
+        Yield (offset, length) of logical ranges which hold data, so that copy and hash
+        loops can skip holes of sparse volumes without reading them. Where holes are
+        not reported by the platform or file system, whole range is yielded as data.
+        """
+        end = self._positions[-1] if length is None else offset + length
+        pending = None  # type: Optional[Tuple[int, int]]
+        for index, start, count in self._segments(offset, end - offset):
+            base = self._positions[index]
+            file = self._pool.acquire(index)
+            try:
+                if self.writable():
+                    file.flush()
+                for data, size in _data_ranges(file.fileno(), start, start + count):
+                    if pending is not None and sum(pending) == base + data:
+                        pending = (pending[0], pending[1] + size)
+                        continue
+                    if pending is not None:
+                        yield pending
+                    pending = (base + data, size)
+            finally:
+                self._pool.release(index)
+        if pending is not None:
+            yield pending
+
+    def verify(self, workers: Optional[int] = None) -> List[pathlib.Path]:
+        """
+        Check volumes against their sidecar digests with `workers` threads.
+        Each volume is read once; return list of volumes which are corrupt or
+        have no digest.
+        """
+        if not self.readable():
+            raise RuntimeError("verify() is supported only in read mode.")
+        algorithm = self._checksum or "sha256"
+        filenames = [info.filename for info in self._fileinfo]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(
+                executor.map(_check_digest, filenames, [algorithm] * len(filenames))
+            )
+        return [filename for filename, ok in zip(filenames, results) if not ok]
+
     def fileno(self) -> int:
         """
         fileno() is incompatible with other implementations.
@@ -239,8 +1726,8 @@ class MultiVolume(io.RawIOBase, contextlib.AbstractContextManager):
     def flush(self) -> None:
         if self._closed:
             return
-        if self._mode == "wb" or self._mode == "w":
-            for file in self._files:
+        if self.writable():
+            for file in self._pool.files():
                 file.flush()
 
     def isatty(self) -> bool:
@@ -249,34 +1736,98 @@ class MultiVolume(io.RawIOBase, contextlib.AbstractContextManager):
     def readable(self) -> bool:
         if self._closed:
             return False
-        return all([f.readable() for f in self._files])
+        return self._mode in ["rb", "r", "rt"]
 
     def readline(self, size: Optional[int] = -1) -> bytes:
-        raise NotImplementedError
+        if size is None:
+            size = -1
+        start = time.perf_counter() if self._stats is not None else 0.0
+        chunks = []
+        while size != 0:
+            if self._readahead:
+                self._read_ahead(max(size, 0))
+            if self._cache is not None:
+                line = self._readline_blocks(size)
+            elif self._maps is not None:
+                line = self._readline_mapped(size)
+            else:
+                current = self._current_index()
+                line = self._file(current).readline(size)
+            if len(line) == 0:
+                break
+            self._position += len(line)
+            chunks.append(line)
+            if line.endswith("\n" if self._text else b"\n"):
+                break
+            # line continues to next volume
+            if size > 0:
+                size -= len(line)
+        if self._cache_policy is not None:
+            self._drop_cache()
+        line = self._join(chunks)
+        if self._stats is not None:
+            self._stats.record("readline", len(line), start)
+        return line
+
+    def _readline_mapped(self, size: int) -> bytes:
+        if self._position >= self._positions[-1]:
+            return b""
+        current = self._current_volume()
+        offset = self._position - self._positions[current]
+        end = self._positions[current + 1] - self._positions[current]
+        if size > 0:
+            end = min(end, offset + size)
+        map = self._maps.get(current)
+        newline = map.find(b"\n", offset, end)
+        if newline >= 0:
+            end = newline + 1
+        return map[offset:end]
 
     def readlines(self, hint: int = -1) -> List[bytes]:
-        raise NotImplementedError
+        if hint is None or hint <= 0:
+            return list(self)
+        lines = []
+        total = 0
+        for line in self:
+            lines.append(line)
+            total += len(line)
+            if total >= hint:
+                break
+        return lines
 
     def seek(self, offset: int, whence: Optional[int] = io.SEEK_SET) -> int:
+        start = time.perf_counter() if self._stats is not None else 0.0
         if whence == io.SEEK_SET:
             target = offset
         elif whence == io.SEEK_CUR:
             target = self._position + offset
         else:
             target = self._positions[-1] + offset
+        if target != self._position:
+            self._seeked = True
+            if self._cache_policy is not None:
+                self._drop_cache(force=True)
+                self._drop_mark = target
         self._position = target
-        i = len(self._files) - 1
-        while i > 0 and target < self._positions[i]:
-            i -= 1
-        file = self._files[i]
-        file.seek(target - self._positions[i], io.SEEK_SET)
+        i = self._locate(target)
+        if self._stats is not None and i != self._current:
+            self._stats.count("volume_switches")
+        self._current = i
+        # mapped and cached reads do not use the file position
+        if self._maps is None and self._cache is None:
+            file = self._file(i)
+            if self._stats is not None:
+                self._stats.count("seeks")
+            file.seek(target - self._positions[i], io.SEEK_SET)
+        if self._stats is not None:
+            self._stats.record("seek", 0, start)
         return self._position
 
     def seekable(self) -> bool:
         if self._mode in ["ab", "at", "a"]:
             return False
         else:
-            return all([f.seekable() for f in self._files])
+            return True
 
     def tell(self) -> int:
         return self._position
@@ -286,32 +1837,111 @@ class MultiVolume(io.RawIOBase, contextlib.AbstractContextManager):
             pos = self.seek(size, io.SEEK_SET)
             assert pos == size
         current = self._current_index()
-        idx = current
-        while idx < len(self._files):
-            file = self._files[idx]
-            if idx == current:
-                pos = file.tell()
-                file.truncate(pos)
-            else:
-                file.seek(0, io.SEEK_SET)
-                file.truncate()
-                file.close()
-                os.unlink(file.name)
-            idx += 1
-        self._files = self._files[:current]
+        file = self._file(current)
+        file.truncate(file.tell())
+        for idx in range(len(self._fileinfo) - 1, current, -1):
+            self._pool.discard(idx)
+            os.unlink(self._fileinfo[idx].filename)
+        del self._fileinfo[current + 1 :]
+        del self._positions[current + 2 :]
+        self._end = self._position
+        self._digest_stale = True
         return self._position
 
     def writable(self) -> bool:
         return self._mode in ["wb", "w", "wt", "x", "xb", "xt", "ab", "a", "at"]
 
-    def writelines(self, lines):
-        raise NotImplementedError
+    def writelines(self, lines) -> None:
+        if not self._mode.endswith("b") or self._sparse:
+            for line in lines:
+                self.write(line)
+            return
+        start = time.perf_counter() if self._stats is not None else 0.0
+        buffers = collections.deque()  # type: collections.deque
+        size = 0
+        written = 0
+        for line in lines:
+            view = memoryview(line).cast("B")
+            buffers.append(view)
+            size += len(view)
+            written += len(view)
+            if len(buffers) >= IOV_MAX or size >= COPY_BUFSIZE:
+                self._writev(buffers, size)
+                size = 0
+        if buffers:
+            self._writev(buffers, size)
+        self._after_write()
+        if self._stats is not None:
+            self._stats.record("writelines", written, start)
+
+    def _writev(self, buffers: collections.deque, size: int) -> None:
+        """Write out and consume `buffers` with vectored writes split at volume boundaries."""
+        while size > 0:
+            current = self._current_index()
+            file = self._file(current)
+            file.flush()
+            pos = file.tell()
+            room = self._volume_size - pos
+            if room <= 0:
+                if current == len(self._fileinfo) - 1:
+                    self._add_volume()
+                continue
+            chunk = []
+            count = 0
+            while buffers and count < room:
+                view = buffers[0]
+                if count + len(view) <= room:
+                    chunk.append(buffers.popleft())
+                    count += len(view)
+                else:
+                    chunk.append(view[: room - count])
+                    buffers[0] = view[room - count :]
+                    count = room
+            for view in chunk:
+                self._update_digest(current, view)
+            _writev_all(file.fileno(), chunk, count)
+            file.seek(pos + count, io.SEEK_SET)
+            self._position += count
+            size -= count
+
+    @property
+    def pool_hits(self) -> int:
+        """Number of volume accesses served by an already opened file."""
+        return self._pool.hits
+
+    @property
+    def pool_misses(self) -> int:
+        """Number of volume accesses that had to open a file."""
+        return self._pool.misses
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return I/O statistics collected with `stats=True`: "calls", "bytes" and "time"
+        per method, total "bytes_read", "bytes_written" and "io_time" in seconds, and
+        counts of "volume_switches", underlying "seeks", "files_opened" and "files_closed".
+        """
+        if self._stats is None:
+            raise RuntimeError("stats() requires stats=True.")
+        return self._stats.snapshot()
+
+    @property
+    def cache_hits(self) -> int:
+        """Number of block reads served by the block cache."""
+        return 0 if self._cache is None else self._cache.hits
+
+    @property
+    def cache_misses(self) -> int:
+        """Number of block reads that had to read a volume."""
+        return 0 if self._cache is None else self._cache.misses
 
     def stat(self) -> stat_result:
         totalsize = 0
         for fi in self._fileinfo:
             totalsize += fi.size
-        return stat_result(self._fileinfo[0].stat, totalsize)
+        first = self._fileinfo[0]
+        if first.stat is None:
+            first.stat = os.stat(first.filename)
+        return stat_result(first.stat, totalsize)
 
     def __del__(self):
         # FIXME
@@ -322,3 +1952,249 @@ class MultiVolume(io.RawIOBase, contextlib.AbstractContextManager):
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.close()
+
+
+def _compressed_bound(size: int) -> int:
+    """Upper bound of compressed size of `size` bytes with any of CODECS."""
+    return size + size // 100 + 600
+
+
+def _read_block_index(filename):
+    """Return codec name, block size, uncompressed size and block end offsets of a volume."""
+    with io.open(filename, mode="rb") as file:
+        filesize = file.seek(0, io.SEEK_END)
+        if filesize >= _BLOCK_FOOTER.size:
+            file.seek(filesize - _BLOCK_FOOTER.size)
+            magic, codec, block_size, size, count = _BLOCK_FOOTER.unpack(
+                file.read(_BLOCK_FOOTER.size)
+            )
+            names = [name for name, (num, _) in CODECS.items() if num == codec]
+            if magic == _BLOCK_MAGIC and names:
+                file.seek(filesize - _BLOCK_FOOTER.size - 8 * count)
+                offsets = struct.unpack("<{}Q".format(count), file.read(8 * count))
+                return names[0], block_size, size, offsets
+    raise RuntimeError("Volume {} does not have a block index.".format(filename))
+
+
+class CompressedMultiVolume(MultiVolume):
+    """
+    MultiVolume which compresses data in blocks of `block_size` bytes with `codec`
+    ("zlib", "bz2" or "lzma"). Volumes roll over on compressed size, and each
+    volume ends with an index of its blocks so that seek() and read() decompress
+    only blocks they touch. In read mode the codec is taken from the volumes.
+    A block, compressed with its worst case overhead, should fit in `volume`.
+
+    Data is written only sequentially, and a partial block is kept in memory until
+    close().
+    """
+
+    def __init__(
+        self,
+        basename: Union[pathlib.Path, str],
+        mode: Optional[str] = "rb",
+        *,
+        codec: str = "zlib",
+        block_size: int = CODEC_BLOCKSIZE,
+        **kwargs: Any
+    ):
+        if mode is None:
+            mode = "rb"
+        if mode not in ["rb", "wb", "xb"]:
+            raise ValueError("Mode {} is not supported with codec.".format(mode))
+        for option in ["use_mmap", "preallocate", "manifest", "cache_policy", "sparse"]:
+            if kwargs.get(option):
+                raise ValueError("{} is not supported with codec.".format(option))
+        if codec not in CODECS:
+            raise ValueError("Unknown codec {}.".format(codec))
+        if block_size < 1:
+            raise ValueError("block_size should be positive.")
+        volume = kwargs.get("volume")
+        if mode != "rb" and volume is not None:
+            # the first block of a volume is written whatever its compressed size
+            if _compressed_bound(block_size) + 8 + _BLOCK_FOOTER.size > volume:
+                raise ValueError("block_size does not fit in volume.")
+        self._codec = codec
+        self._block_size = block_size
+        # per volume codec, block size and compressed end offsets of blocks
+        self._volume_codecs = []  # type: List[str]
+        self._block_sizes = []  # type: List[int]
+        self._indexes = []  # type: List[Any]
+        # writer state of the last volume
+        self._buffer = bytearray()
+        self._offsets = []  # type: List[int]
+        self._emitted = 0
+        self._volume_start = 0
+        super().__init__(basename, mode, **kwargs)
+        if self.writable():
+            # digests are calculated from compressed volumes on close
+            self._digest_stale = True
+        elif self._cache is None:
+            # blocks are always read through the cache
+            self._cache = _BlockCache(CODEC_CACHE_BLOCKS * block_size)
+
+    def _init_reader(self, basename):
+        pos = 0
+        self._positions.append(pos)
+        for name, stat in self._scan_files(basename):
+            codec, block_size, size, offsets = _read_block_index(name)
+            self._fileinfo.append(_FileInfo(name, stat, size))
+            self._volume_codecs.append(codec)
+            self._block_sizes.append(block_size)
+            self._indexes.append(offsets)
+            pos += size
+            self._positions.append(pos)
+
+    def _volume_block_size(self, index: int) -> int:
+        return self._block_sizes[index]
+
+    def _load_block(self, index: int, block: int) -> bytes:
+        offsets = self._indexes[index]
+        start = offsets[block - 1] if block > 0 else 0
+        compressed = self._pread_raw(index, start, offsets[block] - start)
+        return CODECS[self._volume_codecs[index]][1].decompress(compressed)
+
+    def write(
+        self, b: Union[bytes, bytearray, memoryview, Container[Any], mmap]
+    ) -> None:
+        start = time.perf_counter() if self._stats is not None else 0.0
+        size = self._write_blocks(b)
+        self._after_write()
+        if self._stats is not None:
+            self._stats.record("write", size, start)
+
+    def writelines(self, lines) -> None:
+        start = time.perf_counter() if self._stats is not None else 0.0
+        size = 0
+        for line in lines:
+            size += self._write_blocks(line)
+        self._after_write()
+        if self._stats is not None:
+            self._stats.record("writelines", size, start)
+
+    def write_parallel(self, source, workers: Optional[int] = None) -> int:
+        """
+        Write a bytes-like object or whole content of readable `source`.
+        Blocks are compressed concurrently by `workers` threads and written in order.
+        Return written size.
+        """
+        if not self.writable():
+            raise RuntimeError("write_parallel() is supported only in write mode.")
+        start = time.perf_counter() if self._stats is not None else 0.0
+        written = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            if hasattr(source, "read"):
+                while True:
+                    data = source.read(COPY_BUFSIZE)
+                    if len(data) == 0:
+                        break
+                    self._write_blocks(data, executor)
+                    written += len(data)
+            else:
+                with memoryview(source) as view, view.cast("B") as data:
+                    written = self._write_blocks(data, executor)
+        self._after_write()
+        if self._stats is not None:
+            self._stats.record("write_parallel", written, start)
+        return written
+
+    def _write_blocks(self, b, executor=None) -> int:
+        """Buffer `b` and compress and write all complete blocks. Return size of `b`."""
+        with memoryview(b) as view, view.cast("B") as data:
+            self._buffer += data
+            size = len(data)
+        self._position += size
+        count = len(self._buffer) // self._block_size * self._block_size
+        if count == 0:
+            return size
+        compress = CODECS[self._codec][1].compress
+        with memoryview(self._buffer) as view:
+            blocks = [
+                view[start : start + self._block_size]
+                for start in range(0, count, self._block_size)
+            ]
+            if executor is None:
+                compressed = map(compress, blocks)  # type: Any
+            else:
+                compressed = executor.map(compress, blocks)
+            for block, data in zip(blocks, compressed):
+                self._write_block(len(block), data)
+            for block in blocks:
+                block.release()
+        del self._buffer[:count]
+        return size
+
+    def _write_block(self, size: int, data: bytes) -> None:
+        """Write a compressed block of `size` bytes, rolling over on compressed size."""
+        trailer = 8 * (len(self._offsets) + 1) + _BLOCK_FOOTER.size
+        written = self._offsets[-1] if self._offsets else 0
+        if self._offsets and written + len(data) + trailer > self._volume_size:
+            self._finish_volume()
+            self._add_volume()
+            # keep logical volume boundaries
+            self._positions[-2:] = [self._emitted, self._emitted]
+            written = 0
+        self._file(len(self._fileinfo) - 1).write(data)
+        self._offsets.append(written + len(data))
+        self._emitted += size
+
+    def _finish_volume(self) -> None:
+        """Write block index and footer at the end of the last volume."""
+        file = self._file(len(self._fileinfo) - 1)
+        file.write(struct.pack("<{}Q".format(len(self._offsets)), *self._offsets))
+        file.write(
+            _BLOCK_FOOTER.pack(
+                _BLOCK_MAGIC,
+                CODECS[self._codec][0],
+                self._block_size,
+                self._emitted - self._volume_start,
+                len(self._offsets),
+            )
+        )
+        self._fileinfo[-1].size = self._emitted - self._volume_start
+        self._offsets = []
+        self._volume_start = self._emitted
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        if self.writable():
+            if self._buffer:
+                self._write_block(
+                    len(self._buffer),
+                    CODECS[self._codec][1].compress(self._buffer),
+                )
+                self._buffer = bytearray()
+            self._finish_volume()
+        super().close()
+
+    def seek(self, offset: int, whence: Optional[int] = io.SEEK_SET) -> int:
+        if not self.writable():
+            return super().seek(offset, whence)
+        if whence == io.SEEK_SET:
+            target = offset
+        else:
+            target = self._position + offset
+        if target != self._position:
+            raise RuntimeError("seek() is not supported in write mode with codec.")
+        return self._position
+
+    def seekable(self) -> bool:
+        return self._mode == "rb"
+
+    def data_ranges(
+        self, offset: int = 0, length: Optional[int] = None
+    ) -> Iterator[Tuple[int, int]]:
+        # compressed volumes do not have holes
+        end = self._positions[-1] if length is None else offset + length
+        end = min(end, self._positions[-1])
+        if offset < end:
+            yield offset, end - offset
+
+    def copy_to(self, fd_or_file, offset=None, length=None) -> int:
+        raise RuntimeError("copy_to() is not supported with codec.")
+
+    def copy_from(self, fd_or_file, length=None) -> int:
+        raise RuntimeError("copy_from() is not supported with codec.")
+
+    def truncate(self, size: Optional[int] = None) -> int:
+        raise RuntimeError("truncate() is not supported with codec.")
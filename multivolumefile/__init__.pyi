@@ -2,10 +2,26 @@ import contextlib
 import io
 import pathlib
 from mmap import mmap
-from typing import Any, Container, List, Optional, Union
+from typing import (
+    Any,
+    Callable,
+    Container,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from .aio import AsyncMultiVolume as AsyncMultiVolume
+from .aio import aopen as aopen
 
 def open(
-    name: Union[pathlib.Path, str], mode: Any = ..., volume: Any = ...
+    name: Union[pathlib.Path, str],
+    mode: Any = ...,
+    volume: Any = ...,
+    codec: Optional[str] = ...,
 ) -> io.RawIOBase: ...
 
 class _FileInfo:
@@ -14,6 +30,7 @@ class _FileInfo:
     def __init__(self, filename: Any, size: Any) -> None: ...
 
 class MultiVolume(io.RawIOBase, contextlib.AbstractContextManager):
+    name: str
     def __init__(
         self,
         basename: Union[pathlib.Path, str],
@@ -22,19 +39,53 @@ class MultiVolume(io.RawIOBase, contextlib.AbstractContextManager):
         volume: Optional[int] = ...,
         ext_digits: Optional[int] = ...,
         hex: Optional[bool] = ...,
-        ext_start: Optional[int] = ...
+        ext_start: Optional[int] = ...,
+        max_open_files: int = ...,
+        use_mmap: bool = ...,
+        preallocate: bool = ...,
+        manifest: bool = ...,
+        readahead: int = ...,
+        readahead_size: int = ...,
+        cache_policy: Optional[str] = ...,
+        checksum: Optional[str] = ...,
+        block_cache: int = ...,
+        stats: bool = ...,
+        stats_hook: Optional[Callable[[str, int, float], None]] = ...,
+        durability: bool = ...,
+        sync_interval: float = ...,
+        sync_bytes: int = ...,
+        journal: bool = ...,
+        sparse: bool = ...,
+        directories: Optional[List[Union[pathlib.Path, str]]] = ...
     ) -> None: ...
     def read(self, size: int = ...) -> bytes: ...
     def readall(self) -> bytes: ...
     def readinto(
         self, b: Union[bytearray, memoryview, Container[Any], mmap]
     ) -> int: ...
+    def view(self, offset: int, size: int) -> memoryview: ...
+    def pread(self, offset: int, size: int) -> bytes: ...
+    def preadinto(
+        self, offset: int, b: Union[bytearray, memoryview, Container[Any], mmap]
+    ) -> int: ...
     def write(
         self, b: Union[bytes, bytearray, memoryview, Container[Any], mmap]
     ) -> None: ...
+    def write_parallel(self, source: Any, workers: Optional[int] = ...) -> int: ...
     def close(self) -> None: ...
     @property
     def closed(self) -> bool: ...
+    def copy_to(
+        self, fd_or_file: Any, offset: Optional[int] = ..., length: Optional[int] = ...
+    ) -> int: ...
+    def copy_from(self, fd_or_file: Any, length: Optional[int] = ...) -> int: ...
+    def read_ranges(
+        self, ranges: List[Tuple[int, int]], gap: int = ..., workers: int = ...
+    ) -> List[bytes]: ...
+    def data_ranges(
+        self, offset: int = ..., length: Optional[int] = ...
+    ) -> Iterator[Tuple[int, int]]: ...
+    def verify(self, workers: Optional[int] = ...) -> List[pathlib.Path]: ...
     def fileno(self) -> int: ...
     def flush(self) -> None: ...
     def isatty(self) -> bool: ...
@@ -47,6 +98,26 @@ class MultiVolume(io.RawIOBase, contextlib.AbstractContextManager):
     def truncate(self, size: Optional[int] = ...) -> int: ...
     def writable(self) -> bool: ...
     def writelines(self, lines: Any) -> None: ...
+    @property
+    def pool_hits(self) -> int: ...
+    @property
+    def pool_misses(self) -> int: ...
+    def stats(self) -> Dict[str, Any]: ...
+    @property
+    def cache_hits(self) -> int: ...
+    @property
+    def cache_misses(self) -> int: ...
     def __del__(self) -> None: ...
     def __enter__(self): ...
     def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None: ...
+
+class CompressedMultiVolume(MultiVolume):
+    def __init__(
+        self,
+        basename: Union[pathlib.Path, str],
+        mode: Optional[str] = ...,
+        *,
+        codec: str = ...,
+        block_size: int = ...,
+        **kwargs: Any
+    ) -> None: ...
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+#
+#    multi-volume file library
+#    Copyright (C) 2020 Hiroshi Miura
+#
+#    This library is free software; you can redistribute it and/or
+#    modify it under the terms of the GNU Lesser General Public
+#    License as published by the Free Software Foundation; either
+#    version 2.1 of the License, or (at your option) any later version.
+#
+#    This library is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public
+#    License along with this library; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+#
+import asyncio
+import concurrent.futures
+import functools
+import io
+import pathlib
+from typing import Any, AsyncIterator, Optional, Union
+
+import multivolumefile
+
+CHUNKSIZE = 1024 * 1024
+
+
+class AsyncMultiVolume:
+    """
+    asyncio interface of MultiVolume. Blocking I/O runs on a bounded thread pool,
+    and reads spanning several volumes are issued to them concurrently.
+    """
+
+    def __init__(self, mv: "multivolumefile.MultiVolume", *, workers: int = 4):
+        self._mv = mv  # type: Any
+        self._workers = workers
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        self._lock = asyncio.Lock()
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs)
+        )
+
+    @property
+    def name(self) -> str:
+        return self._mv.name
+
+    @property
+    def closed(self) -> bool:
+        return self._mv.closed
+
+    async def read(self, size: int = -1) -> bytes:
+        async with self._lock:
+            position = self._mv.tell()
+            data = await self.pread(position, self._remaining(position, size))
+            await self._run(self._mv.seek, position + len(data))
+            return data
+
+    async def readinto(self, b) -> int:
+        async with self._lock:
+            position = self._mv.tell()
+            length = await self.preadinto(position, b)
+            await self._run(self._mv.seek, position + length)
+            return length
+
+    async def pread(self, offset: int, size: int) -> bytes:
+        mv = self._mv
+        chunks = await asyncio.gather(
+            *[
+                self._run(mv._pread_volume, index, start, count)
+                for index, start, count in mv._segments(offset, size)
+            ]
+        )
+        if len(chunks) == 1:
+            return chunks[0]
+        return b"".join(chunks)
+
+    async def preadinto(self, offset: int, b) -> int:
+        mv = self._mv
+        with memoryview(b) as view, view.cast("B") as target:
+            tasks = []
+            length = 0
+            for index, start, count in mv._segments(offset, len(target)):
+                segment = target[length : length + count]
+                tasks.append(self._run(mv._preadinto_volume, index, start, segment))
+                length += count
+            sizes = await asyncio.gather(*tasks)
+        return sum(sizes)
+
+    async def write(self, b) -> None:
+        async with self._lock:
+            if len(b) > self._mv._volume_size:
+                await self._run(self._mv.write_parallel, b, workers=self._workers)
+            else:
+                await self._run(self._mv.write, b)
+
+    async def seek(self, offset: int, whence: Optional[int] = io.SEEK_SET) -> int:
+        async with self._lock:
+            return await self._run(self._mv.seek, offset, whence)
+
+    def tell(self) -> int:
+        return self._mv.tell()
+
+    async def flush(self) -> None:
+        async with self._lock:
+            await self._run(self._mv.flush)
+
+    async def close(self) -> None:
+        if self._mv.closed:
+            return
+        async with self._lock:
+            await self._run(self._mv.close)
+        self._executor.shutdown(wait=False)
+
+    async def chunks(self, size: int = CHUNKSIZE) -> AsyncIterator[bytes]:
+        """Iterate over rest of volumes in chunks of `size` bytes."""
+        data = await self.read(size)
+        while len(data) > 0:
+            yield data
+            data = await self.read(size)
+
+    def _remaining(self, position: int, size: int) -> int:
+        remaining = max(self._mv._positions[-1] - position, 0)
+        if size is None or size < 0:
+            return remaining
+        return min(size, remaining)
+
+    def __aiter__(self) -> AsyncIterator[bytes]:
+        return self.chunks()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+
+class _AsyncOpener:
+    def __init__(self, name, mode, workers, kwargs):
+        self._name = name
+        self._mode = mode
+        self._workers = workers
+        self._kwargs = kwargs
+        self._file = None  # type: Optional[AsyncMultiVolume]
+
+    async def _open(self) -> AsyncMultiVolume:
+        loop = asyncio.get_running_loop()
+        mv = await loop.run_in_executor(
+            None,
+            functools.partial(
+                multivolumefile.MultiVolume, self._name, self._mode, **self._kwargs
+            ),
+        )
+        return AsyncMultiVolume(mv, workers=self._workers)
+
+    def __await__(self):
+        return self._open().__await__()
+
+    async def __aenter__(self) -> AsyncMultiVolume:
+        self._file = await self._open()
+        return self._file
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self._file.close()
+
+
+def aopen(
+    name: Union[pathlib.Path, str], mode: str = "rb", *, workers: int = 4, **kwargs: Any
+) -> _AsyncOpener:
+    """
+    Open multi-volume files for asyncio. Use as `mv = await aopen(...)` or
+    `async with aopen(...) as mv:`. Keyword arguments are passed to MultiVolume.
+    """
+    return _AsyncOpener(name, mode, workers, kwargs)
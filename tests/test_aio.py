@@ -0,0 +1,99 @@
+import asyncio
+import os
+import time
+
+import multivolumefile as MV
+
+testdata_path = os.path.join(os.path.dirname(__file__), "data")
+
+
+def _expected():
+    with MV.open(os.path.join(testdata_path, "archive.7z"), mode="rb") as mv:
+        return mv.read()
+
+
+def test_async_read():
+    expected = _expected()
+    target = os.path.join(testdata_path, "archive.7z")
+
+    async def run():
+        async with MV.aopen(target, mode="rb", workers=2) as mv:
+            assert await mv.read(100) == expected[:100]
+            assert await mv.seek(24900) == 24900
+            assert await mv.read(200) == expected[24900:25100]
+            b = bytearray(30000)
+            assert await mv.readinto(b) == 27237
+            assert b[:27237] == expected[25100:]
+            assert mv.tell() == 52337
+            assert await mv.read() == b""
+            await mv.seek(0)
+            assert await mv.read() == expected
+        assert mv.closed
+
+    asyncio.run(run())
+
+
+def test_async_chunks():
+    expected = _expected()
+    target = os.path.join(testdata_path, "archive.7z")
+
+    async def run():
+        mv = await MV.aopen(target, mode="rb")
+        chunks = [chunk async for chunk in mv.chunks(10000)]
+        assert [len(c) for c in chunks] == [10000] * 5 + [2337]
+        await mv.seek(50000)
+        assert b"".join([chunk async for chunk in mv]) == expected[50000:]
+        await mv.close()
+
+    asyncio.run(run())
+
+
+def test_async_write(tmp_path):
+    expected = _expected()
+    target = tmp_path.joinpath("target.7z")
+
+    async def run():
+        async with MV.aopen(target, mode="wb", volume=10240) as mv:
+            await mv.write(expected[:1000])
+            await mv.write(expected[1000:])
+        async with MV.aopen(target, mode="rb") as mv:
+            assert await mv.read() == expected
+
+    asyncio.run(run())
+    assert tmp_path.joinpath("target.7z.0006").stat().st_size == 1137
+
+
+def test_async_event_loop_responsive(monkeypatch):
+    target = os.path.join(testdata_path, "archive.7z")
+    pread_volume = MV.MultiVolume._pread_volume
+
+    def slow_pread_volume(self, index, offset, size):
+        time.sleep(0.2)
+        return pread_volume(self, index, offset, size)
+
+    monkeypatch.setattr(MV.MultiVolume, "_pread_volume", slow_pread_volume)
+
+    async def run():
+        ticks = 0
+        done = False
+
+        async def heartbeat():
+            nonlocal ticks
+            while not done:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        async with MV.aopen(target, mode="rb", workers=2) as mv:
+            task = asyncio.ensure_future(heartbeat())
+            await asyncio.sleep(0)
+            start = time.monotonic()
+            data = await mv.read()
+            elapsed = time.monotonic() - start
+            done = True
+            await task
+        assert len(data) == 52337
+        # two volumes are read concurrently
+        assert elapsed < 0.35
+        assert ticks >= 5
+
+    asyncio.run(run())
@@ -0,0 +1,140 @@
+import random
+
+import pytest
+
+import multivolumefile as MV
+
+VOLUME = 64
+MiB = 1024 * 1024
+
+
+def _create(target, volumes):
+    data = bytes(range(256)) * (VOLUME // 256 + 1)
+    with MV.open(target, mode="wb", volume=VOLUME) as f:
+        for _ in range(volumes):
+            f.write(data[:VOLUME])
+
+
+@pytest.mark.benchmark(group="latency")
+@pytest.mark.parametrize("volumes", [10, 1000, 10000])
+def test_benchmark_random_lookup(tmp_path, benchmark, volumes):
+    target = tmp_path.joinpath("target.bin")
+    _create(target, volumes)
+    rnd = random.Random(volumes)
+    offsets = [rnd.randrange(VOLUME * volumes) for _ in range(1000)]
+    with MV.open(target, mode="rb") as f:
+
+        def seek_and_read():
+            for offset in offsets:
+                f.seek(offset)
+                f.read(1)
+
+        benchmark(seek_and_read)
+
+
+@pytest.mark.benchmark(group="lookup")
+@pytest.mark.parametrize("volumes", [10, 1000, 10000])
+def test_benchmark_sequential_lookup(tmp_path, benchmark, volumes):
+    target = tmp_path.joinpath("target.bin")
+    _create(target, volumes)
+    with MV.open(target, mode="rb") as f:
+        f.seek(VOLUME * volumes // 2)
+
+        def small_reads():
+            f.seek(VOLUME * volumes // 2)
+            for _ in range(VOLUME):
+                f.read(1)
+
+        benchmark(small_reads)
+
+
+@pytest.mark.benchmark(group="cache")
+@pytest.mark.parametrize("block_cache", [0, 1024 * 1024])
+def test_benchmark_block_cache(tmp_path, benchmark, block_cache):
+    target = tmp_path.joinpath("target.bin")
+    _create(target, 1000)
+    rnd = random.Random(0)
+    offsets = [rnd.randrange(VOLUME * 1000) for _ in range(1000)]
+    with MV.MultiVolume(target, mode="rb", block_cache=block_cache) as f:
+
+        def seek_and_read():
+            for offset in offsets:
+                f.seek(offset)
+                f.read(16)
+
+        benchmark(seek_and_read)
+
+
+@pytest.mark.benchmark(group="open")
+@pytest.mark.parametrize("volumes", [10, 1000, 10000])
+def test_benchmark_open(tmp_path, benchmark, volumes):
+    target = tmp_path.joinpath("target.bin")
+    _create(target, volumes)
+
+    def open_and_close():
+        MV.open(target, mode="rb").close()
+
+    benchmark(open_and_close)
+
+
+@pytest.mark.benchmark(group="open")
+@pytest.mark.parametrize("volumes", [10, 1000])
+def test_benchmark_append_reopen(tmp_path, benchmark, volumes):
+    target = tmp_path.joinpath("target.bin")
+    _create(target, volumes)
+
+    def reopen():
+        MV.open(target, mode="ab", volume=VOLUME).close()
+
+    benchmark(reopen)
+
+
+@pytest.mark.benchmark(group="write")
+@pytest.mark.parametrize("volume", [64 * 1024, MiB])
+@pytest.mark.parametrize("block", [4096, 64 * 1024, MiB])
+def test_benchmark_sequential_write(tmp_path, benchmark, volume, block):
+    target = tmp_path.joinpath("target.bin")
+    data = bytes(block)
+    count = 4 * MiB // block
+    benchmark.extra_info["bytes"] = 4 * MiB
+
+    def write():
+        with MV.open(target, mode="wb", volume=volume) as f:
+            for _ in range(count):
+                f.write(data)
+
+    benchmark(write)
+
+
+@pytest.mark.benchmark(group="read")
+@pytest.mark.parametrize("volume", [64 * 1024, MiB])
+@pytest.mark.parametrize("block", [4096, 64 * 1024, MiB])
+def test_benchmark_sequential_read(tmp_path, benchmark, volume, block):
+    target = tmp_path.joinpath("target.bin")
+    with MV.open(target, mode="wb", volume=volume) as f:
+        f.write(bytes(4 * MiB))
+    benchmark.extra_info["bytes"] = 4 * MiB
+    with MV.open(target, mode="rb") as f:
+
+        def read():
+            f.seek(0)
+            while f.read(block):
+                pass
+
+        benchmark(read)
+
+
+@pytest.mark.benchmark(group="read")
+@pytest.mark.parametrize("volume", [64 * 1024, MiB])
+def test_benchmark_readall(tmp_path, benchmark, volume):
+    target = tmp_path.joinpath("target.bin")
+    with MV.open(target, mode="wb", volume=volume) as f:
+        f.write(bytes(32 * MiB))
+    benchmark.extra_info["bytes"] = 32 * MiB
+    with MV.open(target, mode="rb") as f:
+
+        def readall():
+            f.seek(0)
+            return f.readall()
+
+        assert len(benchmark(readall)) == 32 * MiB
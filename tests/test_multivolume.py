@@ -1,7 +1,15 @@
 import binascii
+import concurrent.futures
+import errno
 import hashlib
+import io
+import json
 import os
+import random
 import shutil
+import subprocess
+import sys
+import zlib
 
 import pytest
 
@@ -58,7 +66,7 @@ def test_read_context():
         assert mv.readable()
         mv.seek(24900)
         data = mv.read(200)
-        assert len(data) == 100
+        assert len(data) == 200
         data = mv.read(200)
         assert len(data) == 200
 
@@ -69,7 +77,20 @@ def test_readinto():
     with MV.open(target, mode="rb") as mv:
         mv.seek(24900)
         size = mv.readinto(b)
-        assert size == 100
+        assert size == 200
+
+
+def test_readinto_across_volumes():
+    target = os.path.join(testdata_path, "archive.7z")
+    with MV.open(target, mode="rb") as mv:
+        expected = mv.read()
+        mv.seek(20000)
+        b = bytearray(30000)
+        assert mv.readinto(memoryview(b)) == 30000
+        assert b == expected[20000:50000]
+        assert mv.readinto(b) == 2337
+        assert b[:2337] == expected[50000:]
+        assert mv.tell() == 52337
 
 
 def test_read_boundary():
@@ -77,7 +98,21 @@ def test_read_boundary():
     with MV.open(target, mode="rb") as mv:
         mv.seek(24999)
         b = mv.read(200)
-        assert len(b) == 1
+        assert len(b) == 200
+        assert mv.tell() == 25199
+
+
+def test_read_across_volumes():
+    target = os.path.join(testdata_path, "archive.7z")
+    with open(os.path.join(testdata_path, "archive.7z.001"), "rb") as r:
+        expected = r.read()
+    with open(os.path.join(testdata_path, "archive.7z.002"), "rb") as r:
+        expected += r.read()
+    with MV.open(target, mode="rb") as mv:
+        mv.seek(20000)
+        assert mv.read(10000) == expected[20000:30000]
+        assert mv.read(100000) == expected[30000:]
+        assert mv.read(100) == b""
 
 
 def test_readinto_boundary():
@@ -94,18 +129,57 @@ def test_readinto_boundary():
     )
 
 
-def test_readline():
-    target = os.path.join(testdata_path, "archive.7z")
-    with pytest.raises(NotImplementedError):
-        with MV.open(target, mode="rb") as mv:
-            mv.readline()
+def _write_lines(target, lines, volume):
+    with MV.open(target, mode="wb", volume=volume) as mv:
+        for line in lines:
+            mv.write(line)
+
+
+def test_readline(tmp_path):
+    lines = [b"line %d %s\n" % (i, b"x" * (i % 37)) for i in range(500)]
+    target = tmp_path.joinpath("target.log")
+    _write_lines(target, lines, 100)
+    for use_mmap in (False, True):
+        with MV.MultiVolume(target, mode="rb", use_mmap=use_mmap) as mv:
+            for line in lines:
+                assert mv.readline() == line
+            assert mv.readline() == b""
+            mv.seek(0)
+            assert mv.readline(3) == b"lin"
+            assert mv.readline(100) == b"e 0 \n"
+            assert mv.readline(15) == lines[1]
 
 
-def test_readlines():
+def test_readline_iterate(tmp_path):
+    lines = [b"line %d %s\n" % (i, b"x" * (i % 37)) for i in range(500)] + [b"last"]
+    target = tmp_path.joinpath("target.log")
+    _write_lines(target, lines, 150)
+    with MV.open(target, mode="rb") as mv:
+        assert [line for line in mv] == lines
+        mv.seek(0)
+        assert mv.readlines() == lines
+        mv.seek(0)
+        assert mv.readlines(20) == lines[:3]
+
+
+def test_readlines_archive():
     target = os.path.join(testdata_path, "archive.7z")
-    with pytest.raises(NotImplementedError):
-        with MV.open(target, mode="rb") as mv:
-            mv.readlines()
+    with MV.open(target, mode="rb") as mv:
+        expected = mv.read()
+        mv.seek(0)
+        assert b"".join(mv.readlines()) == expected
+
+
+def test_writelines(tmp_path):
+    lines = [b"line %d %s\n" % (i, b"x" * (i % 37)) for i in range(3000)]
+    target = tmp_path.joinpath("target.log")
+    with MV.open(target, mode="wb", volume=1000) as mv:
+        mv.write(b"head\n")
+        mv.writelines(lines)
+        mv.writelines(iter([bytearray(b"tail\n"), memoryview(b"end")]))
+    with MV.open(target, mode="rb") as mv:
+        assert mv.read() == b"".join([b"head\n"] + lines + [b"tail\n", b"end"])
+    assert tmp_path.joinpath("target.log.0001").stat().st_size == 1000
 
 
 def test_readall():
@@ -118,6 +192,16 @@ def test_readall():
     )
 
 
+def test_readall_from_middle():
+    target = os.path.join(testdata_path, "archive.7z")
+    with MV.open(target, mode="rb") as mv:
+        mv.seek(24000)
+        b = mv.readall()
+        assert len(b) == 52337 - 24000
+        assert mv.tell() == 52337
+        assert mv.readall() == b""
+
+
 def test_write(tmp_path):
     target = tmp_path.joinpath("target.7z")
     with MV.open(target, mode="wb", volume=10240) as volume:
@@ -408,3 +492,938 @@ def test_truncate(tmp_path):
     assert target1.stat().st_size == 10240
     assert target2.stat().st_size == 4760
     assert not target3.exists()
+
+
+def test_read_lazy_open():
+    target = os.path.join(testdata_path, "archive.7z")
+    with MV.MultiVolume(target, mode="rb", max_open_files=1) as mv:
+        assert mv.pool_misses == 0
+        mv.seek(24000)
+        data = mv.read(2000)
+        mv.seek(24500)
+        assert mv.read(1000) == data[500:1500]
+        assert mv.pool_misses == 4
+        assert mv.pool_hits > 0
+
+
+def test_write_max_open_files(tmp_path):
+    target = tmp_path.joinpath("target.7z")
+    with open(os.path.join(testdata_path, "archive.7z.001"), "rb") as r:
+        data = r.read()
+    with MV.MultiVolume(target, mode="wb", volume=1000, max_open_files=2) as volume:
+        volume.write(data)
+        volume.seek(500)
+        volume.write(b"\0" * 1000)
+    assert tmp_path.joinpath("target.7z.0025").stat().st_size == 1000
+    with MV.MultiVolume(target, mode="rb", max_open_files=2) as mv:
+        assert mv.read() == data[:500] + b"\0" * 1000 + data[1500:]
+
+
+def test_invalid_max_open_files():
+    target = os.path.join(testdata_path, "archive.7z")
+    with pytest.raises(ValueError):
+        MV.MultiVolume(target, mode="rb", max_open_files=0)
+
+
+def test_read_mmap():
+    target = os.path.join(testdata_path, "archive.7z")
+    with MV.open(target, mode="rb") as mv:
+        expected = mv.read()
+    with MV.MultiVolume(target, mode="rb", use_mmap=True, max_open_files=1) as mv:
+        assert mv.read() == expected
+        mv.seek(24900)
+        assert mv.read(200) == expected[24900:25100]
+        b = bytearray(300)
+        mv.seek(24800)
+        assert mv.readinto(b) == 300
+        assert b == expected[24800:25100]
+        mv.seek(52300)
+        assert mv.read(100) == expected[52300:]
+        assert mv.read(100) == b""
+
+
+def test_mmap_view():
+    target = os.path.join(testdata_path, "archive.7z")
+    with MV.open(target, mode="rb") as mv:
+        expected = mv.read()
+    with MV.MultiVolume(target, mode="rb", use_mmap=True, max_open_files=1) as mv:
+        view = mv.view(40000, 100)
+        assert view.readonly
+        assert view == expected[40000:40100]
+        # evict the map while the view is still alive
+        assert mv.view(100, 10) == expected[100:110]
+        assert view == expected[40000:40100]
+        view.release()
+        with pytest.raises(ValueError):
+            mv.view(24990, 20)
+
+
+def test_mmap_unsupported(tmp_path):
+    target = os.path.join(testdata_path, "archive.7z")
+    with MV.open(target, mode="rb") as mv:
+        with pytest.raises(RuntimeError):
+            mv.view(0, 10)
+    with pytest.raises(ValueError):
+        MV.MultiVolume(tmp_path.joinpath("target.7z"), mode="wb", use_mmap=True)
+
+
+def test_write_many_volumes(tmp_path):
+    target = tmp_path.joinpath("target.bin")
+    data = bytes(range(256)) * 40
+    with MV.open(target, mode="wb", volume=5) as volume:
+        volume.write(data)
+    assert tmp_path.joinpath("target.bin.2048").stat().st_size == 5
+    with MV.open(target, mode="rb") as mv:
+        assert mv.read() == data
+
+
+def test_write_preallocate(tmp_path):
+    target = tmp_path.joinpath("target.7z")
+    with open(os.path.join(testdata_path, "archive.7z.001"), "rb") as r:
+        data = r.read()
+    with MV.MultiVolume(target, mode="wb", volume=10240, preallocate=True) as volume:
+        volume.write(memoryview(data)[:15000])
+        volume.write(bytearray(data[15000:20000]))
+    assert tmp_path.joinpath("target.7z.0001").stat().st_size == 10240
+    assert tmp_path.joinpath("target.7z.0002").stat().st_size == 9760
+    with MV.open(target, mode="rb") as mv:
+        assert mv.read() == data[:20000]
+
+
+def test_readall_bytes():
+    with MV.open(os.path.join(testdata_path, "archive.7z"), mode="rb") as mv:
+        data = mv.read()
+        assert type(data) is bytes
+        assert len(data) == mv.tell()
+
+
+def test_text_mode_across_volumes(tmp_path):
+    target = tmp_path.joinpath("target.txt")
+    text = "".join("line {}\n".format(i) for i in range(100))
+    with MV.MultiVolume(target, mode="wt", volume=100) as volume:
+        volume.write(text)
+    with MV.MultiVolume(target, mode="r") as volume:
+        assert volume.read(95) == text[:95]
+        # line continues to next volume
+        assert volume.readline() == "ine 13\n"
+        assert volume.read(150) == text[102:252]
+        assert volume.readall() == text[252:]
+        assert volume.read(10) == ""
+
+
+def test_read_at_end_after_eviction():
+    with MV.MultiVolume(
+        os.path.join(testdata_path, "archive.7z"), mode="rb", max_open_files=1
+    ) as mv:
+        end = mv.seek(0, io.SEEK_END)
+        assert len(mv.pread(0, 10)) == 10
+        assert mv.read(10) == b""
+        assert mv.tell() == end
+
+
+def test_append_partial_volume(tmp_path):
+    target = tmp_path.joinpath("target.bin")
+    with MV.open(target, mode="wb", volume=1000) as volume:
+        volume.write(b"a" * 1500)
+    with MV.open(target, mode="ab", volume=1000) as volume:
+        for _ in range(10):
+            volume.write(b"b" * 300)
+    sizes = [
+        tmp_path.joinpath("target.bin.{:04d}".format(i)).stat().st_size
+        for i in range(1, 6)
+    ]
+    assert sizes == [1000, 1000, 1000, 1000, 500]
+    with MV.open(target, mode="rb") as volume:
+        assert volume.read() == b"a" * 1500 + b"b" * 3000
+
+
+def test_append_preallocate(tmp_path):
+    target = tmp_path.joinpath("target.7z")
+    with MV.open(target, mode="wb", volume=1000) as volume:
+        volume.write(bytes(1500))
+    with pytest.raises(ValueError):
+        MV.MultiVolume(target, mode="ab", volume=1000, preallocate=True)
+
+
+def test_copy_to(tmp_path):
+    target = os.path.join(testdata_path, "archive.7z")
+    with MV.open(target, mode="rb") as mv:
+        expected = mv.read()
+        mv.seek(0)
+        with open(tmp_path.joinpath("joined.7z"), "wb") as dst:
+            dst.write(b"header")
+            assert mv.copy_to(dst) == 52337
+            assert dst.tell() == 52343
+            assert mv.tell() == 52337
+        fd = os.open(tmp_path.joinpath("part.bin"), os.O_WRONLY | os.O_CREAT)
+        try:
+            assert mv.copy_to(fd, 24000, 2000) == 2000
+        finally:
+            os.close(fd)
+        assert mv.tell() == 52337
+    assert tmp_path.joinpath("joined.7z").read_bytes() == b"header" + expected
+    assert tmp_path.joinpath("part.bin").read_bytes() == expected[24000:26000]
+
+
+def test_copy_from(tmp_path):
+    source = tmp_path.joinpath("source.bin")
+    with MV.open(os.path.join(testdata_path, "archive.7z"), mode="rb") as mv:
+        expected = mv.read()
+    source.write_bytes(expected)
+    target = tmp_path.joinpath("target.7z")
+    with MV.open(target, mode="wb", volume=10240) as volume:
+        volume.write(expected[:100])
+        with source.open("rb") as src:
+            src.seek(100)
+            assert volume.copy_from(src, 30000) == 30000
+            assert src.tell() == 30100
+            assert volume.copy_from(src) == 52337 - 30100
+        assert volume.tell() == 52337
+    assert tmp_path.joinpath("target.7z.0001").stat().st_size == 10240
+    assert tmp_path.joinpath("target.7z.0006").stat().st_size == 1137
+    with MV.open(target, mode="rb") as mv:
+        assert mv.read() == expected
+
+
+def test_copy_fallback(tmp_path, monkeypatch):
+    def refuse(*args):
+        raise OSError(errno.EXDEV, "refused")
+
+    monkeypatch.setattr(os, "copy_file_range", refuse, raising=False)
+    monkeypatch.setattr(os, "sendfile", refuse, raising=False)
+    target = os.path.join(testdata_path, "archive.7z")
+    with MV.open(target, mode="rb") as mv:
+        expected = mv.read()
+        with open(tmp_path.joinpath("joined.7z"), "wb") as dst:
+            assert mv.copy_to(dst, 0) == 52337
+    assert tmp_path.joinpath("joined.7z").read_bytes() == expected
+
+
+def test_write_parallel(tmp_path):
+    with MV.open(os.path.join(testdata_path, "archive.7z"), mode="rb") as mv:
+        expected = mv.read()
+    target = tmp_path.joinpath("target.7z")
+    with MV.open(target, mode="wb", volume=10240) as volume:
+        volume.write(expected[:1000])
+        assert (
+            volume.write_parallel(memoryview(expected)[1000:40000], workers=4) == 39000
+        )
+        volume.write(expected[40000:41000])
+        with io.BytesIO(expected[41000:]) as src:
+            assert volume.write_parallel(src, workers=2) == 52337 - 41000
+        assert volume.tell() == 52337
+    assert tmp_path.joinpath("target.7z.0001").stat().st_size == 10240
+    assert tmp_path.joinpath("target.7z.0006").stat().st_size == 1137
+    assert not tmp_path.joinpath("target.7z.0007").exists()
+    with MV.open(target, mode="rb") as mv:
+        assert mv.read() == expected
+
+
+def test_write_parallel_hex_digits(tmp_path):
+    data = bytes(range(256)) * 50
+    target = tmp_path.joinpath("target.7z")
+    with MV.MultiVolume(
+        target, mode="wb", volume=800, hex=True, ext_digits=3, ext_start=0
+    ) as volume:
+        volume.write_parallel(data, workers=3)
+    assert tmp_path.joinpath("target.7z.00f").stat().st_size == 800
+    with MV.MultiVolume(target, mode="rb", hex=True, ext_digits=3, ext_start=0) as mv:
+        assert mv.read() == data
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_pread_threads(use_mmap):
+    target = os.path.join(testdata_path, "archive.7z")
+    with MV.open(target, mode="rb") as mv:
+        expected = mv.read()
+    rnd = random.Random(0)
+    ranges = [(rnd.randrange(52337), rnd.randrange(1, 30000)) for _ in range(400)]
+    with MV.MultiVolume(target, mode="rb", max_open_files=1, use_mmap=use_mmap) as mv:
+        mv.seek(100)
+
+        def check(offset, size):
+            assert mv.pread(offset, size) == expected[offset : offset + size]
+            b = bytearray(size)
+            length = mv.preadinto(offset, b)
+            assert b[:length] == expected[offset : offset + size]
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            for future in [
+                executor.submit(check, offset, size) for offset, size in ranges
+            ]:
+                future.result()
+        assert mv.tell() == 100
+        assert mv.read(10) == expected[100:110]
+        assert mv.pread(52330, 100) == expected[52330:]
+        assert mv.pread(60000, 100) == b""
+
+
+def test_manifest(tmp_path):
+    target = tmp_path.joinpath("target.7z")
+    with MV.open(os.path.join(testdata_path, "archive.7z"), mode="rb") as mv:
+        expected = mv.read()
+    with MV.MultiVolume(target, mode="wb", volume=10240, manifest=True) as volume:
+        volume.write(expected)
+    assert tmp_path.joinpath("target.7z.manifest").exists()
+    with MV.MultiVolume(target, mode="rb", manifest=True) as mv:
+        assert mv.pool_misses == 0
+        assert mv.stat().st_size == 52337
+        assert mv.read() == expected
+    # manifest is not taken as a volume
+    with MV.MultiVolume(target, mode="rb") as mv:
+        assert mv.read() == expected
+
+
+def test_manifest_mismatch(tmp_path):
+    target = tmp_path.joinpath("target.7z")
+    with MV.MultiVolume(target, mode="wb", volume=1000, manifest=True) as volume:
+        volume.write(bytes(5000))
+    with tmp_path.joinpath("target.7z.0003").open("ab") as f:
+        f.write(b"extra")
+    with MV.MultiVolume(target, mode="rb", manifest=True) as mv:
+        assert mv.read(1500) == bytes(1500)
+        with pytest.raises(RuntimeError):
+            mv.read(1000)
+
+
+def test_manifest_stale(tmp_path):
+    target = tmp_path.joinpath("target.7z")
+    with MV.MultiVolume(target, mode="wb", volume=1000, manifest=True) as volume:
+        volume.write(bytes(5000))
+    with MV.MultiVolume(target, mode="ab", volume=1000) as volume:
+        volume.write(bytes(5000))
+    assert not tmp_path.joinpath("target.7z.manifest").exists()
+    with MV.MultiVolume(target, mode="rb", manifest=True) as mv:
+        assert len(mv.read()) == 10000
+
+
+def test_read_ignore_non_volumes(tmp_path):
+    target = tmp_path.joinpath("target.7z")
+    with MV.open(target, mode="wb", volume=100) as volume:
+        volume.write(bytes(range(250)))
+    for name in [
+        "target.7z.bak",
+        "target.7z.sha256",
+        "target.7z.0001.sha256",
+        "target.7z.+002",
+        "target.7z.4",
+        "target.7z.004",
+        "target.7z.00004",
+    ]:
+        tmp_path.joinpath(name).write_bytes(b"garbage")
+    with MV.open(target, mode="rb") as mv:
+        assert mv.read() == bytes(range(250))
+
+
+def test_read_volumes_over_digits(tmp_path):
+    target = tmp_path.joinpath("target.7z")
+    data = bytes(range(256)) * 5
+    with MV.MultiVolume(target, mode="wb", volume=10, ext_digits=2) as volume:
+        volume.write(data)
+    assert tmp_path.joinpath("target.7z.128").exists()
+    with MV.MultiVolume(target, mode="rb", ext_digits=2) as mv:
+        assert mv.read() == data
+
+
+def test_read_hex_volumes(tmp_path):
+    target = tmp_path.joinpath("target.7z")
+    data = bytes(range(256)) * 5
+    with MV.MultiVolume(target, mode="wb", volume=10, hex=True, ext_digits=2) as volume:
+        volume.write(data)
+    assert tmp_path.joinpath("target.7z.80").exists()
+    with MV.MultiVolume(target, mode="rb", hex=True, ext_digits=2) as mv:
+        assert mv.read() == data
+
+
+def test_read_missing_volume(tmp_path):
+    target = tmp_path.joinpath("target.7z")
+    with MV.open(target, mode="wb", volume=100) as volume:
+        volume.write(bytes(350))
+    tmp_path.joinpath("target.7z.0002").unlink()
+    with pytest.raises(FileNotFoundError):
+        MV.open(target, mode="rb")
+
+
+def test_readahead(tmp_path, monkeypatch):
+    target = tmp_path.joinpath("target.bin")
+    data = bytes(range(256)) * 40
+    with MV.open(target, mode="wb", volume=1000) as volume:
+        volume.write(data)
+    advised = []
+    names = {f.stat().st_ino: f.name for f in tmp_path.iterdir()}
+
+    def fadvise(fd, offset, length, advice):
+        advised.append((names[os.fstat(fd).st_ino], length, advice))
+
+    monkeypatch.setattr(os, "posix_fadvise", fadvise, raising=False)
+    monkeypatch.setattr(os, "POSIX_FADV_WILLNEED", 3, raising=False)
+    with MV.MultiVolume(target, mode="rb", readahead=2, readahead_size=300) as mv:
+        assert mv.read(600) == data[:600]
+        assert advised == []
+        assert mv.read(200) == data[600:800]
+        assert advised == [("target.bin.0002", 300, 3), ("target.bin.0003", 300, 3)]
+        assert mv.read(1000) == data[800:1800]
+        assert advised[-1] == ("target.bin.0004", 300, 3)
+        # random access does not prefetch
+        del advised[:]
+        mv.seek(5800)
+        assert mv.read(100) == data[5800:5900]
+        assert advised == []
+        assert mv.read(100) == data[5900:6000]
+        assert [a[0] for a in advised] == ["target.bin.0007", "target.bin.0008"]
+
+
+def test_readahead_thread(tmp_path, monkeypatch):
+    target = tmp_path.joinpath("target.bin")
+    data = bytes(range(256)) * 40
+    with MV.open(target, mode="wb", volume=1000) as volume:
+        volume.write(data)
+    monkeypatch.delattr(os, "posix_fadvise", raising=False)
+    with MV.MultiVolume(target, mode="rb", readahead=3, readahead_size=500) as mv:
+        chunks = []
+        chunk = mv.read(100)
+        while chunk:
+            chunks.append(chunk)
+            chunk = mv.read(100)
+    assert b"".join(chunks) == data
+
+
+def _trace_fadvise(tmp_path, monkeypatch):
+    calls = []
+
+    def name(fd):
+        for f in tmp_path.iterdir():
+            if f.stat().st_ino == os.fstat(fd).st_ino:
+                return f.name
+
+    def fadvise(fd, offset, length, advice):
+        calls.append((name(fd), offset, length, advice))
+
+    def fdatasync(fd):
+        calls.append((name(fd), "sync"))
+
+    monkeypatch.setattr(os, "posix_fadvise", fadvise, raising=False)
+    monkeypatch.setattr(os, "fdatasync", fdatasync, raising=False)
+    monkeypatch.setattr(os, "POSIX_FADV_SEQUENTIAL", 2, raising=False)
+    monkeypatch.setattr(os, "POSIX_FADV_DONTNEED", 4, raising=False)
+    return calls
+
+
+def test_cache_policy_stream_read(tmp_path, monkeypatch):
+    target = tmp_path.joinpath("target.bin")
+    data = bytes(range(256)) * 12
+    with MV.open(target, mode="wb", volume=1000) as volume:
+        volume.write(data)
+    calls = _trace_fadvise(tmp_path, monkeypatch)
+    with MV.MultiVolume(target, mode="rb", cache_policy="stream") as mv:
+        assert mv.read(500) == data[:500]
+        assert calls == [("target.bin.0001", 0, 0, 2)]
+        assert mv.read(1000) == data[500:1500]
+        assert calls[1:] == [
+            ("target.bin.0002", 0, 0, 2),
+            ("target.bin.0001", 0, 1000, 4),
+            ("target.bin.0002", 0, 500, 4),
+        ]
+        del calls[:]
+        assert mv.read(100) == data[1500:1600]
+        assert calls == []
+    assert calls == [("target.bin.0002", 500, 100, 4)]
+
+
+def test_cache_policy_stream_write(tmp_path, monkeypatch):
+    target = tmp_path.joinpath("target.bin")
+    data = bytes(range(256)) * 12
+    calls = _trace_fadvise(tmp_path, monkeypatch)
+    with MV.MultiVolume(
+        target, mode="wb", volume=1000, cache_policy="stream"
+    ) as volume:
+        volume.write(data)
+    dropped = [c for c in calls if c[-1] != 2]
+    assert dropped == [
+        ("target.bin.0001", "sync"),
+        ("target.bin.0001", 0, 1000, 4),
+        ("target.bin.0002", "sync"),
+        ("target.bin.0002", 0, 1000, 4),
+        ("target.bin.0003", "sync"),
+        ("target.bin.0003", 0, 1000, 4),
+        ("target.bin.0004", "sync"),
+        ("target.bin.0004", 0, 72, 4),
+    ]
+    with MV.open(target, mode="rb") as volume:
+        assert volume.read() == data
+
+
+def test_cache_policy_unknown(tmp_path):
+    with pytest.raises(ValueError):
+        MV.MultiVolume(
+            tmp_path.joinpath("target.bin"), mode="wb", volume=1000, cache_policy="none"
+        )
+
+
+def _sidecar(path):
+    with open(str(path) + ".sha256") as f:
+        return f.read()
+
+
+def test_checksum_write_and_verify(tmp_path):
+    target = tmp_path.joinpath("target.bin")
+    data = bytes(range(256)) * 12
+    with MV.MultiVolume(target, mode="wb", volume=1000, checksum="sha256") as mv:
+        mv.write(data[:1500])
+        # first volume digest is emitted on rollover
+        assert tmp_path.joinpath("target.bin.0001.sha256").exists()
+        mv.writelines([data[1500:1600], data[1600:2200]])
+        mv.write_parallel(data[2200:])
+    for i in range(4):
+        name = "target.bin.{:04d}".format(i + 1)
+        digest = hashlib.sha256(data[i * 1000 : (i + 1) * 1000]).hexdigest()
+        assert _sidecar(tmp_path.joinpath(name)) == "{}  {}\n".format(digest, name)
+    assert _sidecar(target) == "{}  target.bin\n".format(
+        hashlib.sha256(data).hexdigest()
+    )
+    with MV.MultiVolume(target, mode="rb") as mv:
+        assert mv.verify(workers=2) == []
+    with tmp_path.joinpath("target.bin.0003").open("r+b") as f:
+        f.write(b"broken")
+    tmp_path.joinpath("target.bin.0004.sha256").unlink()
+    with MV.MultiVolume(target, mode="rb") as mv:
+        assert mv.verify(workers=2) == [
+            tmp_path.joinpath("target.bin.0003"),
+            tmp_path.joinpath("target.bin.0004"),
+        ]
+
+
+def test_checksum_random_write(tmp_path):
+    target = tmp_path.joinpath("target.bin")
+    data = bytearray(bytes(range(256)) * 12)
+    with MV.MultiVolume(target, mode="wb", volume=1000, checksum="sha256") as mv:
+        mv.write(data)
+        mv.seek(500)
+        mv.write(b"overwrite")
+    data[500:509] = b"overwrite"
+    assert _sidecar(target).split()[0] == hashlib.sha256(data).hexdigest()
+    with MV.MultiVolume(target, mode="rb") as mv:
+        assert mv.verify() == []
+
+
+def test_checksum_unknown():
+    with pytest.raises(ValueError):
+        MV.MultiVolume("target.bin", mode="wb", checksum="unknown")
+
+
+@pytest.mark.parametrize("codec", ["zlib", "bz2", "lzma"])
+def test_codec_roundtrip(tmp_path, codec):
+    target = tmp_path.joinpath("target.bin")
+    rnd = random.Random(0)
+    data = b"".join(b"line %d\n" % rnd.getrandbits(32) for _ in range(20000))
+    with MV.CompressedMultiVolume(
+        target, mode="wb", volume=20000, codec=codec, block_size=8192
+    ) as volume:
+        volume.write(data[:100000])
+        volume.writelines([data[100000:100010], data[100010:200000]])
+        volume.write_parallel(data[200000:])
+    volumes = sorted(tmp_path.iterdir())
+    assert len(volumes) > 1
+    assert all(v.stat().st_size <= 20000 for v in volumes)
+    assert sum(v.stat().st_size for v in volumes) < len(data)
+    with MV.open(target, mode="rb", codec=codec) as volume:
+        assert volume.stat().st_size == len(data)
+        assert volume.read() == data
+        volume.seek(0)
+        assert volume.readlines() == data.splitlines(True)
+
+
+def test_codec_block_size_fits_volume(tmp_path):
+    target = tmp_path.joinpath("target.bin")
+    with pytest.raises(ValueError):
+        MV.CompressedMultiVolume(target, mode="wb", volume=10000)
+    assert not list(tmp_path.iterdir())
+    data = os.urandom(50000)
+    with MV.CompressedMultiVolume(
+        target, mode="wb", volume=10000, block_size=8192
+    ) as volume:
+        volume.write(data)
+    assert all(v.stat().st_size <= 10000 for v in tmp_path.iterdir())
+    with MV.open(target, mode="rb", codec="zlib") as volume:
+        assert volume.read() == data
+
+
+def test_codec_random_access(tmp_path, monkeypatch):
+    target = tmp_path.joinpath("target.bin")
+    rnd = random.Random(0)
+    data = bytes(rnd.choice(b"abcd") for _ in range(100000))
+    with MV.CompressedMultiVolume(
+        target, mode="wb", volume=10000, block_size=4096
+    ) as volume:
+        volume.write(data)
+    decompressed = []
+    decompress = zlib.decompress
+
+    def counting(data):
+        decompressed.append(len(data))
+        return decompress(data)
+
+    monkeypatch.setattr(zlib, "decompress", counting)
+    with MV.CompressedMultiVolume(target, mode="rb") as volume:
+        volume.seek(50000)
+        assert volume.read(100) == data[50000:50100]
+        assert len(decompressed) == 1
+        # spans two blocks, one of them cached
+        assert volume.read(4096) == data[50100:54196]
+        assert len(decompressed) == 2
+        assert volume.pread(99990, 100) == data[99990:]
+
+
+def test_codec_unsupported(tmp_path):
+    target = tmp_path.joinpath("target.bin")
+    with pytest.raises(ValueError):
+        MV.open(target, mode="ab", codec="zlib")
+    with pytest.raises(ValueError):
+        MV.open(target, mode="wb", codec="unknown")
+    with MV.open(target, mode="wb", codec="zlib") as volume:
+        volume.write(b"data")
+        with pytest.raises(RuntimeError):
+            volume.seek(0)
+
+
+def test_block_cache(tmp_path):
+    target = tmp_path.joinpath("target.bin")
+    data = b"".join(b"line %d\n" % i for i in range(30000))
+    with MV.open(target, mode="wb", volume=100000) as volume:
+        volume.write(data)
+    with MV.MultiVolume(target, mode="rb", block_cache=256 * 1024) as volume:
+        volume.seek(len(data) - 100)
+        assert volume.read(100) == data[-100:]
+        assert (volume.cache_hits, volume.cache_misses) == (0, 1)
+        volume.seek(99990)
+        buf = bytearray(20)
+        assert volume.readinto(buf) == 20
+        assert buf == data[99990:100010]
+        assert volume.cache_misses == 3
+        assert volume.pread(len(data) - 50, 10) == data[-50:-40]
+        assert volume.pread(100000, 5) == data[100000:100005]
+        assert (volume.cache_hits, volume.cache_misses) == (2, 3)
+        volume.seek(0)
+        assert list(volume) == data.splitlines(True)
+
+
+def test_block_cache_seek(tmp_path):
+    target = tmp_path.joinpath("target.bin")
+    data = bytes(range(256)) * 1024
+    with MV.open(target, mode="wb", volume=100000) as volume:
+        volume.write(data)
+    with MV.MultiVolume(
+        target, mode="rb", block_cache=1024 * 1024, stats=True
+    ) as volume:
+        for offset in [150000, 10, 250000, 99990]:
+            volume.seek(offset)
+            assert volume.read(20) == data[offset : offset + 20]
+        # seeks do not reach volume files when reads go through the cache
+        assert volume.stats()["seeks"] == 0
+
+
+def test_block_cache_eviction(tmp_path):
+    target = tmp_path.joinpath("target.bin")
+    data = bytes(range(256)) * 1024
+    with MV.open(target, mode="wb", volume=100000) as volume:
+        volume.write(data)
+    with MV.MultiVolume(target, mode="rb", block_cache=MV.CACHE_BLOCKSIZE) as volume:
+        assert volume.read() == data
+        volume.seek(0)
+        assert volume.read(10) == data[:10]
+        assert volume.cache_hits == 0
+        assert volume.read(10) == data[10:20]
+        assert volume.cache_hits == 1
+    with pytest.raises(ValueError):
+        MV.MultiVolume(target, mode="wb", block_cache=MV.CACHE_BLOCKSIZE)
+
+
+def test_stats(tmp_path):
+    target = tmp_path.joinpath("target.bin")
+    data = bytes(range(256)) * 10
+    events = []
+    with MV.MultiVolume(
+        target, mode="wb", volume=1000, stats_hook=lambda *args: events.append(args)
+    ) as volume:
+        volume.write(data[:1500])
+        volume.writelines([data[1500:2000], data[2000:]])
+        stats = volume.stats()
+    assert stats["bytes_written"] == len(data)
+    assert stats["calls"] == {"write": 1, "writelines": 1}
+    assert stats["files_opened"] == 3
+    assert [e[:2] for e in events] == [("write", 1500), ("writelines", 1060)]
+    with MV.MultiVolume(target, mode="rb", stats=True, max_open_files=1) as volume:
+        assert volume.read(1200) == data[:1200]
+        volume.seek(100)
+        assert volume.pread(2000, 100) == data[2000:2100]
+        stats = volume.stats()
+    assert stats["calls"] == {"read": 1, "seek": 1, "pread": 1}
+    assert stats["bytes_read"] == 1300
+    # read into volume 2, then seek back to volume 1
+    assert stats["volume_switches"] == 2
+    assert stats["seeks"] == 1
+    assert stats["files_opened"] == 4
+    assert stats["files_closed"] == 3
+    assert stats["io_time"] > 0
+
+
+def test_stats_seek_switch(tmp_path):
+    target = tmp_path.joinpath("target.bin")
+    with MV.open(target, mode="wb", volume=1000) as volume:
+        volume.write(bytes(2500))
+    with MV.MultiVolume(target, mode="rb", stats=True) as volume:
+        volume.seek(1500)
+        assert volume.read(10) == bytes(10)
+        assert volume.stats()["volume_switches"] == 1
+
+
+def test_stats_disabled(tmp_path):
+    with MV.MultiVolume(tmp_path.joinpath("target.bin"), mode="wb") as volume:
+        with pytest.raises(RuntimeError):
+            volume.stats()
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_read_ranges(tmp_path, monkeypatch, workers):
+    target = tmp_path.joinpath("target.bin")
+    data = os.urandom(10000)
+    with MV.open(target, mode="wb", volume=1000) as volume:
+        volume.write(data)
+    reads = []
+    pread_volume = MV.MultiVolume._pread_volume
+
+    def counting(self, index, offset, size):
+        reads.append((index, offset, size))
+        return pread_volume(self, index, offset, size)
+
+    monkeypatch.setattr(MV.MultiVolume, "_pread_volume", counting)
+    ranges = [(5000, 10), (100, 50), (120, 10), (9990, 100), (990, 20), (130, 0)]
+    with MV.MultiVolume(target, mode="rb") as volume:
+        volume.seek(42)
+        result = volume.read_ranges(ranges, gap=1000, workers=workers)
+        assert volume.tell() == 42
+    assert result == [data[o : o + n] for o, n in ranges]
+    # 100-1010 crosses a volume boundary, 5000 and 9990 are read alone
+    assert sorted(reads) == [(0, 100, 900), (1, 0, 10), (5, 0, 10), (9, 990, 10)]
+
+
+def test_durability(tmp_path, monkeypatch):
+    target = tmp_path.joinpath("target.bin")
+    synced = []
+    fdatasync = getattr(os, "fdatasync", os.fsync)
+
+    def recording(fd):
+        for f in tmp_path.iterdir():
+            if f.stat().st_ino == os.fstat(fd).st_ino:
+                synced.append(f.name)
+        fdatasync(fd)
+
+    monkeypatch.setattr(os, "fdatasync", recording, raising=False)
+    data = bytes(range(256)) * 10
+    with MV.MultiVolume(
+        target,
+        mode="wb",
+        volume=1000,
+        durability=True,
+        sync_interval=3600,
+        sync_bytes=300,
+    ) as volume:
+        volume.write(data[:100])
+        volume.write(data[100:2200])
+        volume.write(data[2200:2300])
+        volume.write_parallel(data[2300:])
+    # two rollovers, one batch over sync_bytes and the last volume on close
+    assert sorted(synced) == [
+        "target.bin.0001",
+        "target.bin.0002",
+        "target.bin.0003",
+        "target.bin.0003",
+    ]
+    with MV.open(target, mode="rb") as volume:
+        assert volume.read() == data
+
+
+def test_flush_exclusive_mode(tmp_path):
+    target = tmp_path.joinpath("target.bin")
+    with MV.MultiVolume(target, mode="xb", volume=1000) as volume:
+        volume.write(b"data")
+        volume.flush()
+        assert tmp_path.joinpath("target.bin.0001").stat().st_size == 4
+
+
+def test_journal_resume(tmp_path):
+    target = tmp_path.joinpath("target.bin")
+    data = bytes(range(256)) * 16
+    script = "\n".join(
+        [
+            "import os, multivolumefile as MV",
+            "data = bytes(range(256)) * 16",
+            "f = MV.MultiVolume({!r}, mode='wb', volume=1000, journal=True,".format(
+                str(target)
+            ),
+            "                   sync_interval=3600, sync_bytes=10 ** 9)",
+            "f.write(data[:2500])",
+            "f._wait_syncs()",
+            "f.write(data[2500:2900])",
+            "f.flush()",
+            "os._exit(0)",
+        ]
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", script], cwd=root, check=True)
+    assert tmp_path.joinpath("target.bin.0003").stat().st_size == 900
+    assert tmp_path.joinpath("target.bin.journal").exists()
+    tmp_path.joinpath("target.bin.0004").write_bytes(b"torn")
+    with MV.MultiVolume(
+        target, mode="ab", volume=1000, journal=True, stats=True
+    ) as volume:
+        # resumed from the last committed volume boundary
+        assert volume.tell() == 2000
+        assert not tmp_path.joinpath("target.bin.0004").exists()
+        assert tmp_path.joinpath("target.bin.0003").stat().st_size == 0
+        volume.write(data[2000:2500])
+        volume.write(data[2500:])
+        # finished volumes are not opened, only 0003 to 0005 are created
+        assert volume.stats()["files_opened"] == 3
+    assert tmp_path.joinpath("target.bin.0003").stat().st_size == 1000
+    assert not tmp_path.joinpath("target.bin.journal").exists()
+    with MV.open(target, mode="rb") as volume:
+        assert volume.read() == data
+
+
+def test_journal_torn_entry(tmp_path):
+    target = tmp_path.joinpath("target.bin")
+    data = bytes(range(256)) * 20
+    with MV.open(target, mode="wb", volume=1000) as volume:
+        volume.write(data[:5000])
+    journal = tmp_path.joinpath("target.bin.journal")
+    journal.write_text(
+        '{"index": 0, "size": 1000}\n{"index": 1, "size": 1000}\n{"index": 2, "si'
+    )
+    with MV.MultiVolume(target, mode="ab", volume=1000, journal=True) as volume:
+        assert volume.tell() == 2000
+        volume.write(data[2000:5000])
+        volume._wait_syncs()
+        # entries after the torn one are readable on the next resume
+        entries = [json.loads(line) for line in journal.read_text().splitlines()]
+        assert {"index": 3, "size": 1000} in entries
+    with MV.open(target, mode="rb") as volume:
+        assert volume.read() == data[:5000]
+
+
+def test_journal_stale(tmp_path):
+    target = tmp_path.joinpath("target.bin")
+    journal = tmp_path.joinpath("target.bin.journal")
+    journal.write_text('{"index": 2, "size": 1000}\n')
+    with MV.MultiVolume(target, mode="wb", volume=1000, journal=True) as volume:
+        # a new write does not continue journal of an earlier run
+        assert journal.read_text() == ""
+        volume.write(b"B" * 1500)
+    assert not journal.exists()
+    with MV.MultiVolume(target, mode="rb") as volume:
+        assert volume.read() == b"B" * 1500
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_sparse_write(tmp_path, parallel):
+    target = tmp_path.joinpath("target.bin")
+    data = bytearray(300000)
+    data[100000:100010] = b"x" * 10
+    data[250000] = 0x79
+    with MV.MultiVolume(
+        target, mode="wb", volume=200000, sparse=True, checksum="sha256"
+    ) as volume:
+        if parallel:
+            volume.write_parallel(data)
+        else:
+            volume.write(data[:150000])
+            volume.write(data[150000:])
+    assert tmp_path.joinpath("target.bin.0001").stat().st_size == 200000
+    assert tmp_path.joinpath("target.bin.0002").stat().st_size == 100000
+    assert _sidecar(target).split()[0] == hashlib.sha256(data).hexdigest()
+    with MV.MultiVolume(target, mode="rb") as volume:
+        assert volume.read() == data
+        ranges = list(volume.data_ranges())
+        assert volume.verify() == []
+    for offset in [100000, 100009, 250000]:
+        assert any(o <= offset < o + n for o, n in ranges)
+    with MV.MultiVolume(target, mode="rb") as volume:
+        # data ranges and holes between them read back the same content
+        rebuilt = bytearray(len(data))
+        for offset, length in ranges:
+            rebuilt[offset : offset + length] = volume.pread(offset, length)
+        assert rebuilt == data
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_sparse_overwrite(tmp_path, parallel):
+    target = tmp_path.joinpath("target.bin")
+    with MV.MultiVolume(target, mode="wb", volume=100000, sparse=True) as volume:
+        volume.write(b"x" * 40000)
+        volume.seek(0)
+        if parallel:
+            volume.write_parallel(bytes(40000))
+        else:
+            volume.write(bytes(40000))
+    with MV.MultiVolume(target, mode="rb") as volume:
+        assert volume.read() == bytes(40000)
+
+
+def test_sparse_append(tmp_path):
+    target = tmp_path.joinpath("target.bin")
+    with MV.MultiVolume(target, mode="wb", volume=100000) as volume:
+        volume.write(b"x" * 100)
+    with pytest.raises(ValueError):
+        MV.MultiVolume(target, mode="ab", volume=100000, sparse=True)
+
+
+def test_data_ranges_dense(tmp_path):
+    target = tmp_path.joinpath("target.bin")
+    with MV.open(target, mode="wb", volume=1000) as volume:
+        volume.write(b"\x01" * 2500)
+    with MV.open(target, mode="rb") as volume:
+        assert list(volume.data_ranges()) == [(0, 2500)]
+        assert list(volume.data_ranges(900, 200)) == [(900, 200)]
+
+
+def test_directories(tmp_path):
+    dirs = [tmp_path.joinpath("d{}".format(i)) for i in range(3)]
+    for d in dirs:
+        d.mkdir()
+    data = bytes(range(256)) * 40
+    target = tmp_path.joinpath("target.bin")
+    with MV.MultiVolume(target, mode="wb", volume=1000, directories=dirs) as volume:
+        volume.write(data[:5000])
+        volume.write_parallel(data[5000:], workers=3)
+    for num in range(1, 11):
+        assert dirs[(num - 1) % 3].joinpath("target.bin.{:04d}".format(num)).exists()
+    assert not list(tmp_path.glob("target.bin.*"))
+    with MV.MultiVolume(
+        target, mode="rb", directories=[str(d) for d in dirs]
+    ) as volume:
+        assert volume.read() == data
+        assert volume.read_ranges([(900, 300), (3999, 2), (9000, 240)], workers=3) == [
+            data[900:1200],
+            data[3999:4001],
+            data[9000:9240],
+        ]
+    with MV.MultiVolume(target, mode="ab", volume=1000, directories=dirs) as volume:
+        volume.write(b"\x01" * 1500)
+    assert dirs[2].joinpath("target.bin.0012").exists()
+    with MV.MultiVolume(target, mode="rb", directories=dirs) as volume:
+        assert volume.read() == data + b"\x01" * 1500
+
+
+def test_directories_manifest(tmp_path):
+    dirs = [tmp_path.joinpath("a"), tmp_path.joinpath("b")]
+    for d in dirs:
+        d.mkdir()
+    data = bytes(range(256)) * 10
+    target = tmp_path.joinpath("target.bin")
+    with MV.MultiVolume(
+        target, mode="wb", volume=1000, manifest=True, directories=dirs
+    ) as volume:
+        volume.write(data)
+    assert dirs[1].joinpath("target.bin.0002").exists()
+    with MV.MultiVolume(target, mode="rb", manifest=True, directories=dirs) as volume:
+        assert volume.read() == data